@@ -0,0 +1,164 @@
+"""
+Cold archive for the append-only histories (chat messages, notes, Spectorial entries).
+
+The session state, and the persisted state, keep only the newest entries of
+each history, the hot tail; older ones are moved here when the tail outgrows
+its share of the session's memory budget (see spill_count and dashb's
+"Memory budget" section) and are read back only when someone pages back,
+searches or exports.
+
+One archive per user and history, next to the state (store.user_state_path):
+
+    cse_dashboard_state.chat_history.archive       zlib-compressed blocks, each a JSON array of records
+    cse_dashboard_state.chat_history.archive.idx   one fixed-width record per block: first position,
+                                                   count, byte offset and length
+    cse_dashboard_state.chat_history.archive.lock  flock held while writing
+
+The index is a recordlog.RecordLog, read incrementally like the progress
+log; the data file is append-only too (O_APPEND). Positions are absolute
+(0 = the oldest entry ever written). Writers take a file lock around
+"what is archived so far, write the missing blocks, index them", so two
+sessions or processes spilling overlapping ranges write each entry once; a
+block is still only used if it starts where the archive ends. Reading a
+range decompresses just the blocks it overlaps, and the last few blocks
+read stay decompressed.
+"""
+
+import os
+import json
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from store import UserRegistry, file_lock
+from columns import OBJECT_OVERHEAD
+from recordlog import RecordLog
+
+BLOCK_DTYPE = np.dtype([("start", "<i8"), ("count", "<i4"), ("offset", "<i8"), ("length", "<i4")])
+ARCHIVE_FILE = "cse_dashboard_state.{key}.archive"
+BLOCK_ITEMS = 256
+CACHED_BLOCKS = 8
+
+
+def entry_sizes(items):
+    """Approximate in-memory bytes of each entry: its text plus a fixed per-object overhead."""
+    sizes = getattr(items, "entry_sizes", None)  # a ChatLog measures its columnar base without materializing it
+    if sizes is not None:
+        return sizes()
+    return np.fromiter((OBJECT_OVERHEAD + sum(len(v) for v in e.values() if isinstance(v, str)) for e in items),
+                       dtype=np.int64, count=len(items))
+
+
+def spill_count(sizes, budget, keep=0):
+    """
+    How many of the oldest entries to archive so the rest fit in `budget` bytes: none while the
+    entries fit, else enough to get down to half the budget, so spills happen once per half budget
+    of new entries rather than on every save. The newest `keep` entries always stay.
+    """
+    total = int(sizes.sum()) if len(sizes) else 0
+    if total <= budget or len(sizes) <= keep:
+        return 0
+    # bytes still held after dropping the first i entries, for every i
+    remaining = total - np.concatenate(([0], np.cumsum(sizes)))
+    drop = int(np.argmax(remaining <= budget // 2))
+    return min(drop, len(sizes) - keep)
+
+
+class HistoryArchive(RecordLog):
+    def __init__(self, path):
+        super().__init__(path + ".idx", BLOCK_DTYPE)  # the records are the block index
+        self.data_path = path
+        self.lock_path = path + ".lock"
+        self._count = 0  # entries archived
+        self._cache = OrderedDict()  # block number -> decoded records
+
+    @property
+    def count(self):
+        self.refresh()
+        return self._count
+
+    def _extend(self, new):
+        # a block is used only if it starts where the archive ends; anything else repeats entries it holds
+        keep = []
+        for i, rec in enumerate(new):
+            if int(rec["start"]) == self._count:
+                keep.append(i)
+                self._count += int(rec["count"])
+        return super()._extend(new[keep])
+
+    def add(self, start, records):
+        """
+        Archives records as positions start, start+1, ...; the ones the archive already holds are
+        skipped. Returns how many were written. ValueError if start is past the end (a gap).
+        """
+        os.makedirs(os.path.dirname(self.data_path), exist_ok=True)
+        with file_lock(self.lock_path):
+            count = self.count
+            if start > count:
+                raise ValueError(f"archive ends at {count}, cannot append at {start}")
+            records = records[count - start:]
+            if not len(records):
+                return 0
+            index = np.empty((len(records) + BLOCK_ITEMS - 1) // BLOCK_ITEMS, dtype=BLOCK_DTYPE)
+            fd = os.open(self.data_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                for b, i in enumerate(range(0, len(records), BLOCK_ITEMS)):
+                    chunk = records[i:i + BLOCK_ITEMS]
+                    data = zlib.compress(json.dumps(list(chunk), separators=(",", ":"), ensure_ascii=False).encode("utf-8"), 6)
+                    os.write(fd, data)
+                    end = os.lseek(fd, 0, os.SEEK_CUR)  # with O_APPEND: the end of what we just wrote
+                    index[b] = (count + i, len(chunk), end - len(data), len(data))
+            finally:
+                os.close(fd)
+            # the index goes last: a reader never sees a block whose bytes are not all on disk
+            self.append(index)
+        return len(records)
+
+    def _block(self, b):
+        # under self._lock
+        records = self._cache.get(b)
+        if records is not None:
+            self._cache.move_to_end(b)
+            return records
+        rec = self._records[b]
+        with open(self.data_path, "rb") as f:
+            f.seek(int(rec["offset"]))
+            records = json.loads(zlib.decompress(f.read(int(rec["length"]))))
+        self._cache[b] = records
+        while len(self._cache) > CACHED_BLOCKS:
+            self._cache.popitem(last=False)
+        return records
+
+    def iter_blocks(self, start=0, stop=None):
+        """Yields the records of positions [start, stop) one block at a time."""
+        self.refresh()
+        with self._lock:
+            stop = self._count if stop is None else min(stop, self._count)
+            if start >= stop:
+                return
+            starts = self.records["start"]
+            first = int(np.searchsorted(starts, start, side="right")) - 1
+            last = int(np.searchsorted(starts, stop, side="left"))
+        for b in range(first, last):
+            with self._lock:
+                block_start = int(self._records[b]["start"])
+                records = self._block(b)
+            yield records[max(start - block_start, 0):stop - block_start]
+
+    def read(self, start, stop):
+        """Records of positions [start, stop), as plain dicts."""
+        return [r for block in self.iter_blocks(start, stop) for r in block]
+
+    def stats(self):
+        self.refresh()
+        with self._lock:
+            return {"entries": self._count, "blocks": self._n,
+                    "bytes": int(self.records["length"].sum()), "cached_blocks": len(self._cache)}
+
+
+_archives = UserRegistry(HistoryArchive)
+
+
+def get_archive(user, key, path=ARCHIVE_FILE):
+    return _archives.get(path.format(key=key), user)
@@ -0,0 +1,276 @@
+"""
+Rerun benchmark for dashb.py at realistic data sizes.
+
+For every scale (courses x chat messages x notes) a fresh interpreter seeds
+a synthetic cse_dashboard_state.json in a throwaway directory, then drives
+the app headless (streamlit AppTest): the first render, every page picked
+from the sidebar radio, and the main handlers (chat submit, progress edit,
+Add Course, Add Note, Save Entry). Per action it records
+
+    wall_ms     median wall time over --repeat runs
+    peak_kb     peak Python allocations during one more run, under tracemalloc
+    written_kb  bytes written per run (journal, WAL, logs, indexes), from the
+                process's write counter in /proc/self/io; elsewhere the growth
+                of the state directory, which a WAL checkpoint can make negative.
+                A background compaction an action starts is counted against it,
+                so it is only compared between runs with the same --repeat
+
+Every scale runs in its own process, since the stores and indexes are
+process-wide singletons keyed by their (relative) paths.
+
+    python bench.py                                  table for the default scales, written KB checked against bench_baseline.json
+    python bench.py --scales 10x100x20 --repeat 5
+    python bench.py --json out.json                  also write the numbers
+    python bench.py --baseline base.json             exit 1 on any regression vs a saved --json
+    python bench.py --json bench_baseline.json       record a new baseline
+
+bench_baseline.json is a reference run of the default scales. Wall times and
+peaks depend on the machine, so by default only script errors and written KB
+are checked against it; compare timings with --baseline against a --json
+recorded on the same hardware.
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+import tracemalloc
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashb.py")
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+PAGES = ["🏠 Dashboard", "🤖 AI Mentor", "📝 Notes", "🧪 Quizzes", "🧪 Code Runner", "🌌 Spectorial"]
+SCALES = ["10x100x20", "100x2000x200", "500x20000x2000"]
+STATE_FILE = "cse_dashboard_state.json"
+DB_FILE = "cse_dashboard_state.sqlite"
+TOLERANCE = 0.25
+SLACK_MS = 20.0
+SLACK_KB = 256.0
+WORDS = ("python recursion data project streamlit bug debug study algorithms web api queue stack "
+         "graph tree sort search loop class function memory pointer test deploy").split()
+
+
+# ------------------ Seeding ------------------
+def _text(i, n):
+    return " ".join(WORDS[(i * 7 + k * 3) % len(WORDS)] for k in range(n))
+
+
+def seed_state(courses, messages, notes):
+    ts = "2025-01-01T00:00:00+00:00"
+    return {
+        "courses": [{"Course": f"Course {i}", "Completion": (i * 37) % 101,
+                     "Status": ("Not Started", "In Progress", "Completed")[i % 3]} for i in range(courses)],
+        "chat_history": [{"sender": "user" if i % 2 == 0 else "bot", "message": _text(i, 12), "ts": ts}
+                         for i in range(messages)],
+        "notes": [{"title": f"Note {i}", "body": _text(i, 40), "ts": ts} for i in range(notes)],
+    }
+
+
+def parse_scale(label):
+    courses, messages, notes = (int(x) for x in label.lower().split("x"))
+    return courses, messages, notes
+
+
+# ------------------ Actions ------------------
+# (name, page, action); the page is picked first and is not part of the timing
+def _goto(at, page):
+    if at.session_state["nav_page"] != page:
+        at.sidebar.radio(key="nav_page").set_value(page).run()
+
+
+def _chat_submit(at):
+    at.text_input[[t.label for t in at.text_input].index("Ask the AI mentor (type 'bye' to clear memory)")].input(
+        "how should I study recursion in python")
+    at.button(key="FormSubmitter:chat_form-Send").click().run()
+
+
+def _progress_edit(at):
+    # AppTest has no data_editor API: the edits go in through the widget state
+    n = len(at.session_state["courses"])
+    rows = {i: {"Completion": int(at.session_state["courses"]["Completion"].iloc[i]) % 100 + 1} for i in range(0, n, max(n // 5, 1))}
+    at.session_state[f"course_editor_{at.session_state['course_editor_rev']}"] = {
+        "edited_rows": rows, "added_rows": [], "deleted_rows": []}
+    at.button(key="FormSubmitter:course_editor-Apply changes").click().run()
+
+
+def _add_course(at):
+    at.button[[b.label for b in at.button].index("➕ Add Course")].click().run()
+    at.text_input[[t.label for t in at.text_input].index("Course name")].input(f"Bench {time.time_ns()}")
+    at.button(key="FormSubmitter:add_course-Add").click().run()
+
+
+def _add_note(at):
+    at.text_input[[t.label for t in at.text_input].index("Title")].input("bench note")
+    at.text_area[[t.label for t in at.text_area].index("Body")].input(_text(3, 40))
+    at.button(key="FormSubmitter:note_form-Add Note").click().run()
+
+
+def _save_entry(at):
+    at.text_area[[t.label for t in at.text_area].index("Write your reflective entry here")].input(_text(5, 60))
+    at.button[[b.label for b in at.button].index("Save Entry")].click().run()
+
+
+ACTIONS = ([(f"page {p}", None, lambda at, p=p: at.sidebar.radio(key="nav_page").set_value(p).run()) for p in PAGES] + [
+    ("chat submit", "🤖 AI Mentor", _chat_submit),
+    ("progress edit", "🏠 Dashboard", _progress_edit),
+    ("add course", "🏠 Dashboard", _add_course),
+    ("add note", "📝 Notes", _add_note),
+    ("save entry", "🌌 Spectorial", _save_entry),
+])
+
+
+def _dir_bytes(path="."):
+    return sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+
+
+def _written():
+    try:
+        with open("/proc/self/io", encoding="ascii") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("wchar:"))
+    except (OSError, StopIteration):
+        return _dir_bytes()
+
+
+def _settle():
+    # store compaction runs on a background thread: wait for it, so its writes count against the action that
+    # started it rather than whichever action happens to be running when it finishes
+    for t in threading.enumerate():
+        if t.name == "lpd-compact":
+            t.join()
+
+
+def _errors(at):
+    return [str(e.value)[:200] for e in at.exception]
+
+
+# ------------------ Child: one scale ------------------
+def _child(label, repeat):
+    logging.disable(logging.WARNING)
+    from streamlit.testing.v1 import AppTest
+    os.chdir(tempfile.mkdtemp(prefix="lpd-bench-"))
+    with open(STATE_FILE, "w", encoding="utf-8") as f:
+        json.dump(seed_state(*parse_scale(label)), f)
+    seeded = _dir_bytes()
+
+    results = {}
+    before = _written()
+    t0 = time.perf_counter()
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.run()
+    _settle()
+    # SQLite checkpoints the WAL into the database when its last connection closes, which happens whenever
+    # a rerun thread's connection is collected; holding one open keeps that out of the measured actions
+    keep = sqlite3.connect(DB_FILE) if os.path.exists(DB_FILE) else None
+    if keep is not None:
+        keep.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+    results["first render"] = {"wall_ms": (time.perf_counter() - t0) * 1000, "peak_kb": None,
+                               "written_kb": (_written() - before) / 1024, "errors": _errors(at)}
+    for name, page, action in ACTIONS:
+        times, errors, written, peak = [], [], 0, None
+        for i in range(repeat + 1):
+            # a page action starts elsewhere, so the switch itself is what gets timed
+            _goto(at, page or (PAGES[1] if name == f"page {PAGES[0]}" else PAGES[0]))
+            traced = i == repeat
+            if traced:
+                tracemalloc.start()
+            before = _written()
+            t = time.perf_counter()
+            action(at)
+            elapsed = time.perf_counter() - t
+            _settle()
+            written += _written() - before
+            if traced:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            else:
+                times.append(elapsed)
+            errors += _errors(at)
+        results[name] = {"wall_ms": statistics.median(times) * 1000, "peak_kb": peak / 1024,
+                         "written_kb": written / 1024 / (repeat + 1), "errors": sorted(set(errors))}
+    state_kb = _dir_bytes() / 1024
+    if keep is not None:
+        keep.close()
+    print(json.dumps({"actions": results, "state_kb": state_kb, "seeded_kb": seeded / 1024, "repeat": repeat}))
+
+
+def run_scale(label, repeat=3):
+    env = dict(os.environ)
+    for k in ("OPENAI_API_KEY", "DEEPSEEK_API_KEY", "LPD_USER"):
+        env.pop(k, None)
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", label, str(repeat)],
+                          capture_output=True, text=True, encoding="utf-8", env=env, timeout=3600)
+    out = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not out:
+        raise RuntimeError(f"{label}: child failed\n{proc.stderr[-2000:]}")
+    return json.loads(out[-1])
+
+
+# ------------------ Report ------------------
+def check(report, baseline=None, tolerance=TOLERANCE, keys=("wall_ms", "peak_kb", "written_kb")):
+    # keys: the baseline numbers to compare; script errors are always reported
+    problems = []
+    for label, res in report.items():
+        base = (baseline or {}).get(label, {})
+        # written KB is averaged over the runs, so a one-off write (a compaction) only compares at the same --repeat
+        same_runs = base.get("repeat") == res.get("repeat")
+        base = base.get("actions", {})
+        for name, r in res["actions"].items():
+            if r["errors"]:
+                problems.append(f"{label} {name}: script raised {r['errors'][0]}")
+            b = base.get(name)
+            if not b:
+                continue
+            if "wall_ms" in keys and r["wall_ms"] > b["wall_ms"] * (1 + tolerance) + SLACK_MS:
+                problems.append(f"{label} {name}: {r['wall_ms']:.0f} ms (baseline {b['wall_ms']:.0f} ms)")
+            for key in ("peak_kb", "written_kb"):
+                if key in keys and (key != "written_kb" or same_runs) and r[key] is not None and b.get(key) is not None and r[key] > b[key] * (1 + tolerance) + SLACK_KB:
+                    problems.append(f"{label} {name}: {key} {r[key]:.0f} (baseline {b[key]:.0f})")
+    return problems
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="AppTest rerun benchmark for dashb.py")
+    ap.add_argument("--scales", nargs="*", default=SCALES, help="courses x messages x notes, e.g. 10x100x20")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--json", dest="json_out")
+    ap.add_argument("--baseline", help=f"a saved --json to compare all numbers against (default: written KB only, vs {os.path.basename(BASELINE)} if present)")
+    ap.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = ap.parse_args(argv)
+
+    report = {}
+    for label in args.scales:
+        report[label] = res = run_scale(label, args.repeat)
+        print(f"{label}  (seeded {res['seeded_kb']:.0f} KB, state after run {res['state_kb']:.0f} KB)")
+        print(f"    {'action':<22}{'wall ms':>10}{'peak KB':>10}{'written KB':>12}")
+        for name, r in res["actions"].items():
+            peak = f"{r['peak_kb']:10.0f}" if r["peak_kb"] is not None else f"{'—':>10}"
+            flag = "  !" if r["errors"] else ""
+            print(f"    {name:<22}{r['wall_ms']:10.1f}{peak}{r['written_kb']:12.1f}{flag}")
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    baseline, keys = None, ("wall_ms", "peak_kb", "written_kb")
+    path = args.baseline
+    if path is None and os.path.exists(BASELINE) and os.path.abspath(args.json_out or "") != BASELINE:
+        # the committed reference was recorded elsewhere: only its machine-independent numbers apply here
+        path, keys = BASELINE, ("written_kb",)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            baseline = json.load(f)
+    problems = check(report, baseline, args.tolerance, keys)
+    for p in problems:
+        print("FAIL", p)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3 and sys.argv[1] == "--child":
+        _child(sys.argv[2], int(sys.argv[3]))
+    else:
+        sys.exit(main())
@@ -0,0 +1,266 @@
+"""
+Compact typed representations of the two largest parts of the state.
+
+Courses: a DataFrame with a categorical Status and int8 Completion
+(course_frame). The journal still stores plain records, so single rows can be
+diffed and rewritten. A CourseLookup is built from one version of the frame
+for the per-message lookups (name -> completion, top course, course names
+mentioned in a message), so those don't scan the frame.
+
+Chat history: a ChatLog, i.e. a read-only columnar base (an Arrow table with
+a dictionary-encoded sender, the messages and int64 epoch-millisecond
+timestamps) plus a Python tail of ChatMessage objects (__slots__) appended
+since it was loaded. Copies share the base, so every session of a user holds
+one Arrow table instead of its own list of dicts. Messages are materialized
+only when indexed or sliced (the rendered window, new messages), and the
+SQLite store snapshots the log as Arrow IPC (see store.register_codec), which
+is read back zero-copy.
+
+pyarrow is optional: without it a ChatLog is just its tail and snapshots stay JSON.
+"""
+
+import io
+import re
+import time
+from collections.abc import Sequence
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as pa_ipc
+except ImportError:  # plain Python lists and JSON snapshots
+    pa = None
+
+ARROW_AVAILABLE = pa is not None
+
+STATUSES = ("Not Started", "In Progress", "Completed")
+OBJECT_OVERHEAD = 240  # rough bytes of one record object (dict or ChatMessage) beyond its text
+CHAT_TS_FORMAT = "%Y-%m-%d %H:%M:%S UTC"
+
+
+# ------------------ Courses ------------------
+def course_frame(data=None):
+    """Courses as a typed DataFrame: Course str, Completion int8 (0-100), Status categorical."""
+    df = pd.DataFrame(data if data is not None else [], columns=["Course", "Completion", "Status"])
+    completion = pd.to_numeric(df["Completion"], errors="coerce").fillna(0).clip(0, 100)
+    statuses = list(STATUSES) + sorted(set(df["Status"].dropna().astype(str)) - set(STATUSES))
+    return pd.DataFrame({
+        "Course": df["Course"].astype(str),
+        "Completion": completion.astype("int8"),
+        "Status": pd.Categorical(df["Status"].fillna(STATUSES[0]).astype(str), categories=statuses),
+    }).reset_index(drop=True)
+
+
+def status_for(completion):
+    # one vectorized pass over a completion column
+    c = np.asarray(completion)
+    return np.select([c >= 100, c <= 0], ["Completed", "Not Started"], "In Progress")
+
+
+def course_records(df):
+    # plain Python values for the journal (to_dict turns int8/categorical into int/str)
+    return df.to_dict(orient="records") if df is not None else None
+
+
+_WORD_RE = re.compile(r"[\w+#]+")
+
+
+def _words(text):
+    # "Node.js & C++!" -> ("node", "js", "c++")
+    return tuple(_WORD_RE.findall(str(text).lower()))
+
+
+class CourseLookup:
+    """
+    Lookups over one version of the course frame: lowercase name -> (name, completion), the top
+    course, and a matcher for course names mentioned in free text. The first course of a name
+    (case-insensitive) wins, as in importer.merge_courses.
+
+    The matcher is a dict keyed by each name's words, probed with the message's word n-grams for
+    the name lengths that exist, so a message costs O(its words) however many courses there are.
+    Names match as whole words: "AI" matches "ai basics", not "explain"; "C++" matches "c++?".
+    """
+
+    def __init__(self, df):
+        names, completion = df["Course"].astype(str).tolist(), df["Completion"].tolist()
+        self.by_name, self._phrases = {}, {}
+        for name, comp in zip(names, completion):
+            hit = self.by_name.setdefault(name.lower(), (name, int(comp)))
+            words = _words(name)
+            if words:
+                self._phrases.setdefault(words, hit)
+        self._lengths = sorted({len(w) for w in self._phrases}, reverse=True)  # longest name first
+        self.top = None
+        if names:
+            i = int(np.argmax(df["Completion"].to_numpy()))  # the first of equal maxima, like idxmax
+            self.top = (names[i], int(completion[i]))
+
+    def __len__(self):
+        return len(self.by_name)
+
+    def completion(self, name):
+        hit = self.by_name.get(str(name).lower())
+        return hit[1] if hit else None
+
+    def find(self, text):
+        """(name, completion) of the first course named in text (the longest name at that spot), or None."""
+        words = _words(text)
+        for i in range(len(words)):
+            for k in self._lengths:
+                hit = self._phrases.get(words[i:i + k])
+                if hit is not None:
+                    return hit
+        return None
+
+
+# ------------------ Chat ------------------
+def _epoch_ms(ts):
+    if isinstance(ts, (int, float)):
+        return int(ts)
+    if not ts:
+        return 0
+    return int(datetime.fromisoformat(str(ts)).timestamp() * 1000)
+
+
+class ChatMessage:
+    FIELDS = ("sender", "message", "ts")
+    __slots__ = FIELDS + ("_tstr",)
+
+    def __init__(self, sender, message, ts=None):
+        self.sender = sender
+        self.message = message
+        self.ts = int(time.time() * 1000) if ts is None else ts  # epoch milliseconds
+        self._tstr = None
+
+    @classmethod
+    def from_record(cls, rec):
+        if isinstance(rec, cls):
+            return rec
+        # older records carry an ISO timestamp (and a preformatted "tstr")
+        return cls(rec.get("sender"), rec.get("message", ""), _epoch_ms(rec.get("ts")))
+
+    def to_record(self):
+        return {"sender": self.sender, "message": self.message, "ts": self.ts}
+
+    # read access for code written against the old dict records
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.FIELDS else default
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    @property
+    def tstr(self):
+        # formatted on first read and kept, so rerenders of the chat window don't strftime again
+        if self._tstr is None:
+            self._tstr = time.strftime(CHAT_TS_FORMAT, time.gmtime(self.ts / 1000))
+        return self._tstr
+
+    @property
+    def iso(self):
+        return datetime.fromtimestamp(self.ts / 1000, timezone.utc).isoformat()
+
+    def __repr__(self):
+        return f"ChatMessage({self.sender!r}, {self.message!r}, {self.ts})"
+
+
+class ChatLog(Sequence):
+    def __init__(self, base=None, tail=None):
+        self._base = base if base is not None and base.num_rows else None
+        self._base_len = self._base.num_rows if self._base is not None else 0
+        self._tail = tail if tail is not None else []
+
+    @classmethod
+    def from_records(cls, records):
+        return cls(tail=[ChatMessage.from_record(r) for r in records or ()])
+
+    def __len__(self):
+        return self._base_len + len(self._tail)
+
+    def _base_slice(self, start, stop):
+        t = self._base.slice(start, stop - start)
+        cols = [t.column(c).to_pylist() for c in ("sender", "message", "ts")]
+        return [ChatMessage(s, m, ts) for s, m, ts in zip(*cols)]
+
+    def __getitem__(self, i):
+        n = len(self)
+        if isinstance(i, slice):
+            start, stop, step = i.indices(n)
+            if step != 1:
+                return [self[j] for j in range(start, stop, step)]
+            stop = max(start, stop)
+            out = self._base_slice(start, min(stop, self._base_len)) if start < self._base_len else []
+            return out + self._tail[max(start - self._base_len, 0):max(stop - self._base_len, 0)]
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("chat index out of range")
+        if i >= self._base_len:
+            return self._tail[i - self._base_len]
+        return self._base_slice(i, i + 1)[0]
+
+    def append(self, msg):
+        self._tail.append(ChatMessage.from_record(msg))
+
+    def extend(self, msgs):
+        self._tail.extend(ChatMessage.from_record(m) for m in msgs)
+
+    def copy(self):
+        # O(tail): the columnar base is immutable and shared
+        return ChatLog(self._base, list(self._tail))
+
+    def skip(self, n):
+        """The log without its first n messages (moved to the cold archive, see archive.py)."""
+        if n >= self._base_len:
+            return ChatLog(None, self._tail[n - self._base_len:])
+        # take() copies the kept rows, so the dropped ones' buffers can be freed
+        return ChatLog(self._base.take(pa.array(np.arange(n, self._base_len))), list(self._tail))
+
+    def entry_sizes(self):
+        # approximate bytes per message: Arrow rows cost their text plus offsets, tail messages are objects
+        base = np.zeros(0, dtype=np.int64)
+        if self._base is not None:
+            lengths = pc.fill_null(pc.binary_length(self._base.column("message")), 0)
+            base = lengths.to_numpy(zero_copy_only=False).astype(np.int64) + 16
+        tail = np.fromiter((OBJECT_OVERHEAD + len(m.message or "") for m in self._tail), dtype=np.int64, count=len(self._tail))
+        return np.concatenate([base, tail])
+
+    def to_record(self):
+        return [m.to_record() for m in self]
+
+    def to_arrow(self):
+        tail = pa.table({
+            "sender": pa.array([m.sender for m in self._tail], pa.string()).dictionary_encode(),
+            "message": pa.array([m.message for m in self._tail], pa.large_string()),
+            "ts": pa.array([m.ts for m in self._tail], pa.int64()),
+        })
+        if self._base is None:
+            return tail
+        return pa.concat_tables([self._base, tail.cast(self._base.schema)], promote_options="permissive").combine_chunks()
+
+
+def as_chat_log(value):
+    """Whatever the store handed out (ChatLog or a list of records) as a ChatLog."""
+    if isinstance(value, ChatLog):
+        return value
+    return ChatLog.from_records(value)
+
+
+# ------------------ Binary snapshot codec ------------------
+def encode_chat(value):
+    table = as_chat_log(value).to_arrow()
+    sink = io.BytesIO()
+    with pa_ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def decode_chat(data):
+    # zero-copy: the table's buffers point into `data`
+    return ChatLog(pa_ipc.open_stream(pa.py_buffer(data)).read_all())
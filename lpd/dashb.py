@@ -3,75 +3,208 @@
 CSE Learning Path — AI Mentor (Custom Neon UI)
 Save as: app_superior_custom.py
 Run: streamlit run app_superior_custom.py
+
+Profiles: LPD_USER=<name> picks the profile the state is saved under. With
+LPD_USER_PARAM=1 a ?user=<name> URL parameter overrides it; that parameter is
+not authenticated, so anyone who can reach the app can open any profile.
 """
 
 import os
-import sys
-import json
 import time
+import uuid
 import random
-import subprocess
+import importlib.util
 from io import BytesIO
+from itertools import chain
 
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
-import requests
+# plotly, requests and gtts are imported where they are used (see startup_report.py)
+
+from store import (APPEND_KEYS, ARCHIVED_KEY, get_store, diff_state, shadow_of, safe_user_id, register_codec,
+                   archived_range, trim_shadow)
+from archive import get_archive, entry_sizes, spill_count
+from llm import PROVIDERS, ChatClient, build_messages, get_reply_cache, recent_stats, reply_key
+from jobs import get_pool, new_job, is_finished, QueueFull, HashCache, text_hash
+from sandbox import SandboxPool, pool_supported, run_cold
+from search import SOURCES, get_index
+from summary import update_summary, render_summary, top_topics
+from progress import get_progress_log, week_boundaries, course_id
+from syllabus import get_syllabus, course_key, module_completion, read_lessons
+from quiz import get_bank, get_score_log
+from metrics import REGISTRY, SESSION_TTL, timer, observe, count
+from export import COLUMNS, MIME, formats, export_bytes, course_rows, chat_rows, entry_rows, archived_rows, quiz_rows
+from importer import SUFFIXES, read_table, validate, validate_files, merge_courses, import_dir, claim_files, archive
+from columns import (ARROW_AVAILABLE, ChatLog, ChatMessage, CourseLookup, as_chat_log,
+                     course_frame, course_records, decode_chat, encode_chat, status_for)
 
 # ------------------ PAGE CONFIG ------------------
 st.set_page_config(page_title="Learning Path Dashboard", layout="wide", initial_sidebar_state="expanded")
+# per-process timings and counters (see metrics.py); shown on the hidden Diagnostics page
+RERUN_STARTED = time.perf_counter()
+METRICS_FILE = os.environ.get("LPD_METRICS_FILE")
+count("reruns")
 
 # ------------------ Persistence ------------------
 PERSIST_FILE = "cse_dashboard_state.json"
+PERSIST_DB = "cse_dashboard_state.sqlite"
+# "sqlite" (default, WAL + per-user rows) or "file" (JSON journal + flock)
+PERSIST_BACKEND = os.environ.get("LPD_STORE", "sqlite")
+if ARROW_AVAILABLE:
+    # SQLite snapshots keep the chat log as Arrow IPC, shared zero-copy by every session (see columns.py)
+    register_codec("chat_history", encode_chat, decode_chat)
+
+# ?user=<id> picks a profile from the URL. Anyone who can open the app can pass any id, so it is a
+# convenience for trusted setups (one person, several profiles), not access control: off unless set
+USER_FROM_URL = bool(os.environ.get("LPD_USER_PARAM"))
+
+def current_user():
+    # state is scoped per user: ?user=<id> (with LPD_USER_PARAM), else LPD_USER, else "default"
+    return safe_user_id((USER_FROM_URL and st.query_params.get("user")) or os.environ.get("LPD_USER"))
+
+def state_store():
+    return get_store(current_user(), path=PERSIST_FILE, db_path=PERSIST_DB, backend=PERSIST_BACKEND)
 
-def save_state_local():
+def _collect_state():
+    return {
+        "chat_history": st.session_state.chat_history,
+        "topic_memory": st.session_state.topic_memory,
+        "chat_summary": st.session_state.chat_summary,
+        "summary_state": st.session_state.summary_state,
+        "courses": course_records(st.session_state.courses),
+        "notes": st.session_state.notes,
+        "quiz_scores": st.session_state.quiz_scores,
+        "spectorial_entries": st.session_state.spectorial_entries,
+        "theme": st.session_state.theme,
+        "assistant_mode": st.session_state.assistant_mode,
+        ARCHIVED_KEY: st.session_state.archived,
+    }
+
+@timer("state.save")
+def save_state_local(index=True):
+    # only the delta since the last save is appended to the journal (see store.py)
     try:
-        state = {
-            "chat_history": st.session_state.chat_history,
-            "topic_memory": st.session_state.topic_memory,
-            "chat_summary": st.session_state.chat_summary,
-            "courses": st.session_state.courses.to_dict(orient="records") if st.session_state.courses is not None else None,
-            "notes": st.session_state.notes,
-            "quiz_scores": st.session_state.quiz_scores,
-            "spectorial_entries": st.session_state.spectorial_entries,
-            "theme": st.session_state.theme,
-            "assistant_mode": st.session_state.assistant_mode,
-        }
-        with open(PERSIST_FILE, "w", encoding="utf-8") as f:
-            json.dump(state, f, indent=2)
+        shadow, trims = st.session_state.get("_persist_shadow"), []
+        for key, drop in spill_cold_history().items():
+            shadow = trim_shadow(shadow, key, drop)
+            trims.append({"op": "trim", "key": key, "to": history_range(key)[1]})
+        ops, shadow = diff_state(_collect_state(), shadow)
+        seq = state_store().append(trims + ops)
+        st.session_state._persist_shadow = shadow
+        # nobody else wrote in between -> the session is still current, no reload needed
+        if seq is not None and seq == (st.session_state.get("_persist_seq") or 0) + 1:
+            st.session_state._persist_seq = seq
+        count("persists")
+        if index:
+            index_new_entries()
         return True
     except Exception as e:
         st.warning(f"Failed to save local state: {e}")
         return False
 
-def load_state_local():
+@timer("state.load")
+def load_state_local(force=False):
+    # reruns only re-read when the journal moved past what this session already holds
     try:
-        with open(PERSIST_FILE, "r", encoding="utf-8") as f:
-            state = json.load(f)
+        user = current_user()
+        if st.session_state.get("_persist_user") != user:
+            # switched profile: nothing held so far belongs to this user's journal
+            st.session_state._persist_user = user
+            st.session_state._persist_shadow = None
+            force = True
+        since = None if force else st.session_state.get("_persist_seq")
+        state, seq = state_store().load_cached(since=since)
+        st.session_state._persist_seq = seq
+        if state is None:
+            return False
         if state.get("courses"):
-            st.session_state.courses = pd.DataFrame(state.get("courses"))
-        st.session_state.chat_history = state.get("chat_history", [])
+            st.session_state.courses = course_frame(state.get("courses"))
+        st.session_state.chat_history = as_chat_log(state.get("chat_history"))
         st.session_state.topic_memory = state.get("topic_memory")
         st.session_state.chat_summary = state.get("chat_summary")
+        st.session_state.summary_state = state.get("summary_state")
         st.session_state.notes = state.get("notes", [])
         st.session_state.quiz_scores = state.get("quiz_scores", {})
         st.session_state.spectorial_entries = state.get("spectorial_entries", [])
         st.session_state.theme = state.get("theme", st.session_state.theme)
         st.session_state.assistant_mode = state.get("assistant_mode", st.session_state.assistant_mode)
+        st.session_state.archived = state.get(ARCHIVED_KEY) or {}
+        st.session_state._persist_shadow = shadow_of(state)
+        if over_budget(measure_history()):
+            # a history from before the budget (or a bigger one): archive its cold part now; indexing waits for
+            # the first search or new entry, as it would without the spill
+            save_state_local(index=False)
         return True
-    except FileNotFoundError:
-        return False
     except Exception as e:
         st.warning(f"Failed to load local state: {e}")
         return False
 
+# ------------------ Memory budget ------------------
+# Each history (chat, notes, Spectorial) keeps only its newest entries, the hot tail, in the session
+# and in the persisted state. When a tail outgrows its share of the budget, its oldest entries move to
+# the user's compressed archive (archive.py); older chat pages, search hits and exports read them back.
+SESSION_BUDGET_KB = int(os.environ.get("LPD_SESSION_BUDGET_KB", "3072"))
+MIN_HOT = 100  # always in memory: the mentor's context, the first chat pages, the lists on the pages
+
+def history_archive(key):
+    return get_archive(current_user(), key)
+
+def history_range(key):
+    # (first, hot start): entries [first, hot start) of this history are in the archive
+    return archived_range(st.session_state, key)
+
+def cold_entries(key, start, stop):
+    records = history_archive(key).read(start, stop)
+    return [ChatMessage.from_record(r) for r in records] if key == "chat_history" else records
+
+def history_entry(key, pos):
+    hot = history_range(key)[1]
+    if pos >= hot:
+        items = st.session_state[key]
+        # None: indexed by another session from a newer state than this one holds
+        return items[pos - hot] if pos - hot < len(items) else None
+    found = cold_entries(key, pos, pos + 1)
+    return found[0] if found else None
+
+def measure_history():
+    # per-entry size estimates of the hot tails; with the course frame, this session's share in the memory report
+    sizes = {key: entry_sizes(st.session_state[key]) for key in APPEND_KEYS}
+    st.session_state._history_bytes = {key: int(s.sum()) for key, s in sizes.items()}
+    st.session_state._history_bytes["courses"] = int(st.session_state.courses.memory_usage(deep=True).sum())
+    return sizes
+
+def over_budget(sizes):
+    share = SESSION_BUDGET_KB * 1024 // len(APPEND_KEYS)
+    return any(s.sum() > share for s in sizes.values())
+
+def spill_cold_history():
+    """Archives the oldest entries of every history over its share of the budget; returns {key: entries archived}."""
+    share = SESSION_BUDGET_KB * 1024 // len(APPEND_KEYS)
+    spilled = {}
+    for key, sizes in measure_history().items():
+        drop = spill_count(sizes, share, keep=MIN_HOT)
+        if not drop:
+            continue
+        items = st.session_state[key]
+        first, hot = history_range(key)
+        try:
+            history_archive(key).add(hot, [e.to_record() if hasattr(e, "to_record") else e for e in items[:drop]])
+        except (OSError, ValueError):
+            continue  # archive unwritable or behind the state: keep everything in memory
+        st.session_state[key] = items.skip(drop) if hasattr(items, "skip") else items[drop:]
+        st.session_state.archived = {**st.session_state.archived, key: [first, hot + drop]}
+        st.session_state._history_bytes[key] = int(sizes[drop:].sum())
+        spilled[key] = drop
+    return spilled
+
 # ------------------ Session init ------------------
 def init_session_state():
     defaults = {
-        "chat_history": [],
+        "chat_history": ChatLog(),
         "topic_memory": None,
         "chat_summary": None,
+        "summary_state": None,
         "download_blob": None,
         "courses": None,
         "theme": "neon",
@@ -81,12 +214,23 @@ def init_session_state():
         "api_provider": None,
         "api_key": None,
         "deepseek_key": None,
+        "llm_stats": None,
+        "jobs": {},
+        "last_audio": None,
         "use_tts": False,
         "enable_code_exec": False,
         "notes": [],
         "quiz_scores": {},
         "spectorial_entries": [],
         "show_add_course": False,
+        "chat_pages": 1,
+        "course_editor_rev": 0,
+        "archived": {},
+        "_history_bytes": {},
+        "_session_id": uuid.uuid4().hex,
+        "_persist_shadow": None,
+        "_persist_seq": None,
+        "_persist_user": None,
     }
     for k, v in defaults.items():
         if k not in st.session_state:
@@ -102,63 +246,221 @@ def make_course_df():
         {"Course": "Machine Learning", "Completion": 40, "Status": "In Progress"},
         {"Course": "Cybersecurity", "Completion": 30, "Status": "Not Started"},
     ]
-    return pd.DataFrame(base)
+    # plus every course in lpd/courses/ that is not one of the above ("C++" already covers "C++ Programming")
+    known = {course_key(c["Course"]) for c in base}
+    base += [{"Course": c["title"], "Completion": 0, "Status": "Not Started"}
+             for c in get_syllabus().courses() if c["key"] not in known]
+    return course_frame(base)
 
 def now_iso():
     return pd.Timestamp.utcnow().isoformat()
 
+CHAT_PAGE_SIZE = 30
+
+def add_chat_message(sender, message):
+    st.session_state.chat_history.append(ChatMessage(sender, message))
+
+# ------------------ Progress history ------------------
+PROGRESS_DAYS = 28
+
+def progress_log():
+    # every completion change is an event; weekly/daily figures are aggregated from it (see progress.py)
+    return get_progress_log(current_user())
+
+# ------------------ Quiz history ------------------
+QUIZ_SIZE = 3
+
+def score_log():
+    # attempts are appended to a per-user log; quiz_scores in the state is only read to migrate old data
+    log = get_score_log(current_user())
+    if st.session_state.quiz_scores:
+        log.import_legacy(st.session_state.quiz_scores)
+        st.session_state.quiz_scores = {}
+        save_state_local()
+    return log
+
+def quiz_summary(log, names):
+    stats = log.course_stats()
+    rows = [{"Course": n, **stats[cid]} for n, cid in ((n, course_id(n)) for n in names) if cid in stats]
+    if not rows:
+        return None
+    df = pd.DataFrame(rows).rename(columns={"attempts": "Attempts", "mean": "Mean %", "trend": "Trend (pts/attempt)",
+                                            "last": "Last %", "percentile": "Last vs. history (pctl)"})
+    return df.round(1)
+
+# ------------------ Exports ------------------
+EXPORT_LABELS = {"csv": "CSV", "json": "JSON", "ndjson.gz": "NDJSON (gzip)", "parquet": "Parquet"}
+
+def export_buttons(kind, rows, file_stem, key):
+    # rows: zero-argument callable returning the records; Streamlit calls `data` only on click (see export.py)
+    fmts = formats(kind)
+    for col, fmt in zip(st.columns(len(fmts)), fmts):
+        with col:
+            st.download_button(f"⬇️ Export {EXPORT_LABELS[fmt]}", data=lambda fmt=fmt: export_bytes(rows(), fmt, COLUMNS[kind]),
+                               file_name=f"{file_stem}.{fmt}", mime=MIME[fmt], key=f"{key}_{fmt}")
+
+# ------------------ Course editor ------------------
+def apply_course_edits(edited):
+    """Applies every pending edit from the course editor at once; returns how many courses changed."""
+    df = st.session_state.courses
+    old = df["Completion"].to_numpy(dtype=np.int64, copy=True)
+    new = edited["Completion"].to_numpy(dtype=float)
+    new = np.clip(np.where(np.isnan(new), old, new), 0, 100).astype(np.int64)
+    changed = np.flatnonzero(new != old)
+    if not len(changed):
+        return 0
+    rows = df.index[changed]
+    df.loc[rows, "Completion"] = new[changed].astype(np.int8)
+    df.loc[rows, "Status"] = status_for(new[changed])
+    progress_log().record_many(list(zip(df.loc[rows, "Course"].tolist(), new[changed].tolist(), old[changed].tolist())))
+    # a new editor key drops the widget's own copy of the edits, which are now applied
+    st.session_state.course_editor_rev += 1
+    save_state_local()
+    return len(changed)
+
+# ------------------ Bulk import ------------------
+IMPORT_TYPES = [s.lstrip(".") for s in SUFFIXES] + ["gz"]
+
+@timer("courses.import")
+def import_courses(files):
+    """
+    files: [(name, bytes)]. Validates each file, upserts the valid rows of all of them at once, then records
+    progress and persists once. result["failed"] maps the files that could not be read or validated to why.
+    """
+    tables, failed = [], {}
+    for name, data in files:
+        try:
+            tables.append((name, read_table(data, name)))
+        except (ValueError, OSError) as e:
+            failed[name] = str(e)
+    result = {"files": len(files), "failed": failed, "inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0, "rejected": None}
+    valid, rejected, duplicates, invalid = validate_files(tables)
+    failed.update(invalid)
+    if valid is None:
+        return result
+    merged, counts, changes = merge_courses(st.session_state.courses, valid)
+    result.update(counts, duplicates=duplicates, rejected=rejected.head(50) if len(rejected) else None, rejected_count=len(rejected))
+    if counts["inserted"] or counts["updated"]:
+        st.session_state.courses = merged
+        progress_log().record_many(changes)
+        st.session_state.course_editor_rev += 1
+        save_state_local()
+    return result
+
+def import_watched_folder():
+    # files dropped into the user's import folder are picked up on the next Dashboard rerun
+    folder = import_dir(current_user())
+    claimed = claim_files(folder)
+    if not claimed:
+        return None
+    files = []
+    for name, path in claimed:
+        with open(path, "rb") as f:
+            files.append((name, f.read()))
+    result = import_courses(files)
+    for name, path in claimed:
+        archive(folder, path, ok=name not in result["failed"])
+    return result
+
+def show_import_result(result):
+    msg = f"Imported {result['files']} file(s): {result['inserted']} added, {result['updated']} updated, {result['unchanged']} unchanged"
+    if result["duplicates"]:
+        msg += f", {result['duplicates']} duplicate row(s) merged"
+    st.success(msg + ".")
+    for name, reason in result["failed"].items():
+        st.error(f"{name}: {reason}")
+    if result.get("rejected") is not None:
+        st.warning(f"{result['rejected_count']} row(s) rejected" + (" (first 50 shown)" if result["rejected_count"] > 50 else ""))
+        st.dataframe(result["rejected"], hide_index=True)
+
+# ------------------ Course lookup ------------------
+def course_lookup():
+    # rebuilt only when the course frame is replaced or edited in place (apply_course_edits bumps the rev)
+    df, rev = st.session_state.courses, st.session_state.course_editor_rev
+    cached = st.session_state.get("course_lookup")
+    if cached is None or cached[0] is not df or cached[1] != rev:
+        cached = st.session_state.course_lookup = (df, rev, CourseLookup(df))
+    return cached[2]
+
+# ------------------ Syllabus ------------------
+def next_module_hint(course, completion):
+    module = get_syllabus().next_module(course, completion)
+    return f" Next module: {module['title']}." if module else ""
+
+def module_hint(text, course=None):
+    # the one syllabus module whose title clearly matches text (see SyllabusIndex.best_module), else None
+    found = get_syllabus().best_module(text, course=course)
+    if not found:
+        return None
+    c, i = found
+    return f"{c['title']}, module {i + 1}: {c['modules'][i]['title']}"
+
+# ------------------ Search ------------------
+SEARCH_LIMIT = 20
+
+def index_new_entries():
+    # only entries appended since the last call are tokenized (see search.py); called after each save, so
+    # the index only sees persisted entries, and skipped while this session is behind the shared index
+    index = get_index(current_user())
+    index.sync({source: st.session_state.get(source) for source in SOURCES},
+               archived={source: history_range(source) for source in SOURCES}, cold=cold_entries,
+               seq=st.session_state.get("_persist_seq"))
+    return index
+
+def search_panel(label, sources, key):
+    query = st.text_input(label, key=key, placeholder="keywords, or a prefix like recur*")
+    if not query.strip():
+        return
+    index = index_new_entries()
+    t0 = time.perf_counter()
+    hits = index.search(query, sources=sources, limit=SEARCH_LIMIT, first={s: history_range(s)[0] for s in SOURCES})
+    st.caption(f"{len(hits)} result(s) in {(time.perf_counter() - t0) * 1000:.2f} ms")
+    for score, source, pos in hits:
+        e = history_entry(source, pos)  # archived hits are read back from their block
+        if e is None:
+            continue
+        if source == "notes":
+            head, text = e.get("title") or "(untitled)", e.get("body", "")
+        elif source == "spectorial_entries":
+            head, text = e.get("prompt", ""), e.get("entry", "")
+        else:
+            head, text = e.get("sender", ""), e.get("message", "")
+        snippet = text if len(text) <= 240 else text[:240] + "…"
+        st.markdown(f"**{SOURCES[source]} · {head}** — <span class='small-muted'>{e.get('ts', '')}</span>", unsafe_allow_html=True)
+        st.write(snippet)
+
 init_session_state()
 # default courses if none
 if st.session_state.courses is None:
     st.session_state.courses = make_course_df()
-# attempt to load persisted state (do not override defaults if missing fields)
+# attempt to load persisted state (no-op when nothing changed since this session's last load/save)
 load_state_local()
 
 # ------------------ Optional TTS ------------------
-try:
-    from gtts import gTTS
-    TTS_AVAILABLE = True
-except Exception:
-    TTS_AVAILABLE = False
+# only checks that gtts is installed; it is imported the first time TTS is used
+TTS_AVAILABLE = importlib.util.find_spec("gtts") is not None
 
 def tts_speak_bytes(text: str):
+    # runs on the job pool: errors are raised and reported by collect_jobs
     if not TTS_AVAILABLE:
         return None
-    try:
-        tts = gTTS(text=text, lang='en')
-        bio = BytesIO()
-        tts.write_to_fp(bio)
-        bio.seek(0)
-        return bio.read()
-    except Exception as e:
-        st.warning(f"TTS failed: {e}")
-        return None
+    from gtts import gTTS
+    tts = gTTS(text=text, lang='en')
+    bio = BytesIO()
+    tts.write_to_fp(bio)
+    bio.seek(0)
+    return bio.read()
 
 # ------------------ LLM simulation / summarizer ------------------
 def summarize_memory(max_chars=800):
-    msgs = st.session_state.chat_history
-    if not msgs:
-        return None
-    last = msgs[-24:]
-    user_texts = [m['message'] for m in last if m['sender']=='user']
-    kws = ["python","ai","ml","web","data","project","bug","debug","study","recursion","algorithms","streamlit","openai","deepseek"]
-    keywords = set()
-    for t in user_texts:
-        for k in kws:
-            if k in t.lower():
-                keywords.add(k)
-    summary = "Topics: " + (", ".join(sorted(keywords)) if keywords else "general")
-    if user_texts:
-        summary += " | Recent: " + " | ".join(user_texts[-3:])
-    return summary[:max_chars]
+    # folds in only the messages added since the last call (see summary.py)
+    st.session_state.summary_state = update_summary(st.session_state.summary_state, st.session_state.chat_history,
+                                                    history_range("chat_history")[1])
+    topics = top_topics(st.session_state.summary_state, 1)
+    st.session_state.topic_memory = topics[0] if topics else None
+    return render_summary(st.session_state.summary_state, max_chars)
 
 def simulated_llm_reply(user_msg, mode):
-    df = st.session_state.courses
-    try:
-        top = df.loc[df['Completion'].idxmax()]
-        top_hint = f"{top['Course']} ({top['Completion']}%)"
-    except Exception:
-        top_hint = "none"
     msg = user_msg.lower()
     if mode == "Code Helper":
         if any(kw in msg for kw in ["bug","error","traceback","fix"]):
@@ -167,15 +469,18 @@ def simulated_llm_reply(user_msg, mode):
             return "Tip: use st.form to group inputs and st.session_state to persist values. Need snippet?"
         return "Describe the issue and I'll return a short runnable example."
     if mode == "Tutor":
-        for c in st.session_state.courses['Course'].tolist():
-            if c.lower() in msg:
-                comp = int(st.session_state.courses.loc[st.session_state.courses['Course']==c, 'Completion'].values[0])
-                if comp < 50:
-                    return f"You're {comp}% through {c}. Suggestion: 2 focused Pomodoros (25m) + 3 practice problems."
-                else:
-                    return f"At {comp}% in {c}, try a mini-project (1–2 hours). Want ideas?"
+        hit = course_lookup().find(msg)  # O(message words), see columns.CourseLookup
+        if hit:
+            c, comp = hit
+            if comp < 50:
+                return f"You're {comp}% through {c}. Suggestion: 2 focused Pomodoros (25m) + 3 practice problems." + next_module_hint(c, comp)
+            else:
+                return f"At {comp}% in {c}, try a mini-project (1–2 hours). Want ideas?" + next_module_hint(c, comp)
         if "exercise" in msg or "problem" in msg:
             return "Mini exercise: write a function that reverses the words in a sentence but preserves whitespace. Want the solution in Python?"
+        module = module_hint(msg)
+        if module:
+            return f"That's covered in {module}. Suggestion: read its lessons, then 3 practice problems."
         return "Plan: (1) 25m review (2) 45m practice (3) 10m reflect. Want a 7-day plan?"
     if mode == "Motivator":
         choices = [
@@ -186,24 +491,175 @@ def simulated_llm_reply(user_msg, mode):
         return random.choice(choices)
     return "How can I help — study plan, code snippet, or motivation?"
 
+# ------------------ LLM provider ------------------
+def provider_key(provider):
+    key = st.session_state.api_key if provider == "OpenAI" else st.session_state.deepseek_key
+    if key:
+        return key
+    env = PROVIDERS[provider]["key_env"]
+    try:
+        key = st.secrets.get(env)
+    except Exception:
+        key = None
+    return key or os.environ.get(env)
+
+def llm_client():
+    provider = st.session_state.api_provider
+    if provider not in PROVIDERS:
+        return None
+    key = provider_key(provider)
+    return ChatClient(provider, key) if key else None
+
+def stream_reply(job, client, messages):
+    # runs on the job pool: streamed text lands in job["text"] for the chat panel to show
+    try:
+        for chunk in client.stream(messages):
+            job["text"] += chunk
+        return job["text"]
+    finally:
+        job["stats"] = client.last_stats
+
+# ------------------ Reply cache ------------------
+# "" disables the on-disk tier shared by all sessions/processes
+REPLY_CACHE_DB = os.environ.get("LPD_REPLY_CACHE_DB", "cse_reply_cache.sqlite")
+UNCACHED_MODES = ("Motivator",)  # these replies are meant to vary
+
+def reply_cache():
+    return get_reply_cache(REPLY_CACHE_DB or None)
+
+def courses_fingerprint():
+    df = st.session_state.courses
+    return int(pd.util.hash_pandas_object(df[["Course", "Completion"]], index=False).sum())
+
+# ------------------ Background jobs (replies, TTS) ------------------
+JOB_POLL_S = 0.5
+
+def submit_job(kind, fn, *args, **data):
+    return start_job(new_job(kind, **data), fn, *args)
+
+def start_job(job, fn, *args):
+    try:
+        get_pool().submit(job, fn, *args)
+    except QueueFull as e:
+        st.warning(str(e))
+        return None
+    st.session_state.jobs[job["id"]] = job
+    return job
+
+@st.cache_resource(show_spinner=False)
+def tts_cache():
+    return HashCache(max_entries=64)
+
+def synthesize_tts(job, text, cache):
+    try:
+        audio = tts_speak_bytes(text)
+        if audio:
+            cache.put(job["key"], audio)
+        return audio
+    finally:
+        cache.release(job["key"], job)
+
+def request_tts(text):
+    # synthesized off-thread, and never twice for the same text in this process
+    if not (st.session_state.use_tts and TTS_AVAILABLE):
+        return
+    cache = tts_cache()
+    job = new_job("tts", key=text_hash(text, "en"))
+    audio, running = cache.claim(job["key"], job)
+    if audio is not None:
+        st.session_state.last_audio = audio
+    elif running is not None:
+        # another session is synthesizing the same text: wait for its job
+        st.session_state.jobs[running["id"]] = running
+    elif start_job(job, synthesize_tts, text, cache) is None:
+        cache.release(job["key"], job)
+
+def finish_reply(reply):
+    add_chat_message("bot", reply)
+    request_tts(reply)
+
+@timer("mentor.ask")
+def ask_mentor(user_msg, mode, cacheable=False):
+    """
+    Records the user message and answers it: cached and offline replies right away,
+    provider replies on the job pool (picked up later by collect_jobs).
+    cacheable: canned prompts (quick actions, "Ask AI") whose answer doesn't depend on the conversation.
+    """
+    add_chat_message("user", user_msg)
+    client = llm_client()
+    key = None
+    if cacheable and mode not in UNCACHED_MODES:
+        key = reply_key(user_msg, mode, client.provider if client else None, courses_fingerprint() if mode == "Tutor" else "")
+        cached = reply_cache().get(key)
+        if cached is not None:
+            finish_reply(cached)
+            return
+    if client is None:
+        reply = simulated_llm_reply(user_msg, mode)
+        if key:
+            reply_cache().put(key, reply)
+        finish_reply(reply)
+        return
+    if key:
+        # the reply is shared through the cache, so it's built from the prompt alone: no history or memory
+        messages = build_messages(user_msg, mode)
+    else:
+        memory = st.session_state.chat_summary if st.session_state.use_memory else None
+        messages = build_messages(user_msg, mode, st.session_state.chat_history[-11:-1], memory)
+    if submit_job("reply", stream_reply, client, messages, user_msg=user_msg, mode=mode, cache_key=key) is None:
+        finish_reply(simulated_llm_reply(user_msg, mode))
+
+@timer("jobs.collect")
+def collect_jobs():
+    # folds finished jobs into the session; replies are taken strictly in the order they were asked
+    jobs = st.session_state.jobs
+    changed = reply_waiting = False
+    for job_id, job in list(jobs.items()):
+        if job["kind"] == "reply":
+            if reply_waiting or not is_finished(job):
+                reply_waiting = True
+                continue
+            st.session_state.llm_stats = job.get("stats")
+            if job["status"] == "done":
+                reply = job["result"]
+                if job.get("cache_key"):
+                    reply_cache().put(job["cache_key"], reply)
+            elif job["text"]:
+                reply = job["text"] + " …"
+            else:
+                st.warning(f"{job['error']}. Using the offline mentor.")
+                reply = simulated_llm_reply(job["user_msg"], job["mode"])
+            finish_reply(reply)
+            changed = True
+        elif not is_finished(job):
+            continue
+        elif job["status"] == "done":
+            st.session_state.last_audio = job["result"]
+        else:
+            st.warning(f"TTS failed: {job['error']}")
+        del jobs[job_id]
+    if changed:
+        save_state_local()
+    return bool(jobs)
+
 # ------------------ Safe-ish code runner fix ------------------
+@st.cache_resource(show_spinner=False)
+def code_pool():
+    # pre-started workers shared by every session; each snippet runs in a fresh forked child
+    return SandboxPool()
+
+@timer("code.run")
 def run_code_snippet(code: str, timeout=5):
     """
-    Run python code in a subprocess for safety. Returns (stdout, stderr, timed_out_flag).
+    Run python code in a sandboxed worker process. Returns (stdout, stderr, timed_out_flag).
     WARNING: executing arbitrary code runs on the host machine. Use only in trusted env.
     """
     try:
-        proc = subprocess.run(
-            [sys.executable, "-c", code],
-            capture_output=True,
-            text=True,
-            timeout=timeout
-        )
-        return proc.stdout, proc.stderr, False
-    except subprocess.TimeoutExpired:
-        return "", "Execution timed out.", True
+        res = code_pool().run(code, timeout=timeout) if pool_supported() else run_cold(code, timeout=timeout)
     except Exception as e:
         return "", f"Execution failed: {e}", False
+    st.session_state.last_code_run = {"latency": res.get("latency"), "wait": res.get("wait"), "truncated": res["truncated"]}
+    return res["stdout"], res["stderr"], res["timed_out"]
 
 # ------------------ Styling (neon + glass) ------------------
 NEON_CSS = """
@@ -256,10 +712,17 @@ html, body, .main, .block-container { background: linear-gradient(180deg,#050505
 # apply NEON_CSS
 st.markdown(NEON_CSS, unsafe_allow_html=True)
 
+# fold finished background replies / TTS into this session before anything is drawn
+collect_jobs()
+
 # ------------------ Sidebar ------------------
 with st.sidebar:
     st.markdown("## ☰ Menu", unsafe_allow_html=True)
-    page = st.radio("", ["🏠 Dashboard", "🤖 AI Mentor", "📝 Notes", "🧪 Quizzes", "🧪 Code Runner", "🌌 Spectorial"], index=0)
+    pages = ["🏠 Dashboard", "🤖 AI Mentor", "📝 Notes", "🧪 Quizzes", "🧪 Code Runner", "🌌 Spectorial"]
+    if st.query_params.get("diag") or os.environ.get("LPD_DIAGNOSTICS"):
+        # hidden unless asked for: ?diag=1 or LPD_DIAGNOSTICS=1
+        pages.append("🩺 Diagnostics")
+    page = st.radio("", pages, index=0, key="nav_page")
     st.markdown("---")
     st.selectbox("Theme", ["neon"], index=0, help="Theme is currently neon (custom).")
     st.markdown("### Assistant Settings")
@@ -282,20 +745,31 @@ with st.sidebar:
     if st.button("Save App State (local)"):
         ok = save_state_local()
         if ok:
-            st.success("Saved to local JSON.")
+            st.success(f"Saved state for '{current_user()}'.")
     if st.button("Load App State (local)"):
-        ok = load_state_local()
+        ok = load_state_local(force=True)
         if ok:
             st.success("Loaded local state.")
+    st.caption(f"Profile: {current_user()}" + (" (open with ?user=<name> for a separate profile)" if USER_FROM_URL else ""))
     st.markdown("Keys: use `.streamlit/secrets.toml` or env vars `DEEPSEEK_API_KEY`, `OPENAI_API_KEY`.")
     st.markdown("---")
     st.caption("Moscifer • CSE Mentor — Built 2025")
+PAGE_STARTED = time.perf_counter()
 
 # ------------------ Utility: pretty multi-color donut ------------------
+DONUT_CACHE_SIZE = 64
+
+@timer("donut")
 def multicolor_donut(value, size=260, title=None, colors=None, show_center=True):
     # colors: list of color hex; if not provided use rainbow
     if colors is None:
         colors = ["#00FFB2","#00A3FF","#A100FF","#FF3FA0","#FFB84D"]
+    return _build_donut(int(value), size, title, tuple(colors), show_center)
+
+# figures are shared by every session and rerun; st.plotly_chart only reads them
+@st.cache_resource(max_entries=DONUT_CACHE_SIZE, show_spinner=False)
+def _build_donut(value, size, title, colors, show_center):
+    import plotly.graph_objects as go  # only pages with charts pay for plotly
     # create slices: one slice for value and one remainder; then overlay gradient-like ring using multiple thin annular traces
     fig = go.Figure()
 
@@ -318,12 +792,145 @@ def multicolor_donut(value, size=260, title=None, colors=None, show_center=True)
         margin=dict(t=10,b=10,l=10,r=10),
         height=size, width=size,
         paper_bgcolor='rgba(0,0,0,0)',
+        # every color is explicit and the frontend applies the Streamlit theme, so skip the
+        # default plotly template (~6.5 KB of JSON per chart, ~90% of each donut's payload)
+        template="none",
         annotations=[dict(text=f"<span style='font-size:30px;font-weight:700;color:#ffffff'>{value}%</span><br><span style='font-size:10px;color:#bfffc2'>{title or ''}</span>",
                           x=0.5, y=0.5, showarrow=False, font=dict(size=14))] if show_center else []
     )
     fig.update_traces(rotation=90)
     return fig
 
+# ------------------ Chat panel ------------------
+def chat_panel(polling=False):
+    still_running = collect_jobs()
+    st.markdown("<div class='card'>", unsafe_allow_html=True)
+    if st.session_state.chat_summary and st.session_state.use_memory:
+        st.markdown(f"<div class='memory-badge'>🧠 Memory: {st.session_state.chat_summary}</div>", unsafe_allow_html=True)
+    # only the newest chat_pages * CHAT_PAGE_SIZE messages are rendered, as a single block
+    history = st.session_state.chat_history
+    first, hot = history_range("chat_history")
+    total = hot - first + len(history)
+    shown = min(total, st.session_state.chat_pages * CHAT_PAGE_SIZE)
+    if shown < total:
+        # the callback runs before the next rerun, so the page count is already bumped when we render
+        st.button(f"⬆️ Load older messages ({total - shown} hidden)",
+                  on_click=lambda: st.session_state.update(chat_pages=st.session_state.chat_pages + 1))
+    window = history[max(len(history) - shown, 0):]
+    if shown > len(history):
+        # paged back past the hot tail: the older messages come from the archive
+        window = cold_entries("chat_history", hot - (shown - len(history)), hot) + window
+    bubbles = []
+    with timer("chat.render"):
+        for m in window:
+            sender, msg, tstr = m.sender, m.message, m.tstr
+            if sender == "user":
+                bubbles.append(f"<div style='text-align:right'><div class='bubble-user'><b>You:</b> {msg}</div><div class='small-muted' style='text-align:right'>{tstr}</div></div>")
+            else:
+                bubbles.append(f"<div style='text-align:left'><div class='bubble-bot'><b>Assistant:</b> {msg}</div><div class='small-muted'>{tstr}</div></div>")
+    # replies still streaming in on the job pool
+    pending = [j for j in st.session_state.jobs.values() if j["kind"] == "reply"]
+    for job in pending:
+        if job["text"]:
+            bubbles.append(f"<div style='text-align:left'><div class='bubble-bot'><b>Assistant:</b> {job['text']}▌</div></div>")
+    st.session_state.typing = any(not j["text"] for j in pending)
+    if bubbles:
+        st.markdown("".join(bubbles), unsafe_allow_html=True)
+    stats = st.session_state.get("llm_stats")
+    if stats and stats.get("ttft") is not None:
+        st.markdown(f"<div class='small-muted'>{stats['provider']}: first token {stats['ttft']:.2f}s • total {stats['total']:.2f}s • {stats['attempts']} attempt(s)</div>", unsafe_allow_html=True)
+    if st.session_state.typing:
+        st.markdown("<div class='small-muted'>Assistant is typing...</div>", unsafe_allow_html=True)
+    if st.session_state.last_audio:
+        st.audio(st.session_state.last_audio, format='audio/mp3')
+    st.markdown("</div>", unsafe_allow_html=True)
+    if polling and not still_running:
+        # everything landed: one full rerun refreshes the rest of the page and stops the polling
+        st.rerun()
+
+# ------------------ Partial reruns ------------------
+# Interactive regions are fragments: a widget inside one reruns only that function, not the whole
+# script (CSS, sidebar, state load, charts). Their handlers are on_click callbacks, which run before
+# the fragment redraws, so its output already shows the change without an extra st.rerun().
+def fragment(fn=None, *, run_every=None):
+    if fn is None:
+        return lambda f: fragment(f, run_every=run_every)
+    timed = timer(f"fragment {fn.__name__}")(fn)
+    if not hasattr(st, "fragment"):  # older Streamlit: regions rerun with the script
+        return timed
+    return st.fragment(timed, run_every=run_every)
+
+QUICK_PROMPTS = [("💪 Motivate Me", "motivate me", "Motivator"), ("🐍 Python Tip", "tell me about python", "Tutor"),
+                 ("🧠 AI Info", "tell me about ai", "Tutor"), ("🌐 Web Help", "help with web dev", "Tutor")]
+
+def quick_ask(prompt, mode):
+    ask_mentor(prompt, mode=mode, cacheable=True)
+    save_state_local()
+
+def send_chat():
+    text = (st.session_state.get("chat_input") or "").strip()
+    if not text:
+        return
+    ask_mentor(text, mode=st.session_state.assistant_mode)
+    if st.session_state.use_memory:
+        st.session_state.chat_summary = summarize_memory()
+    save_state_local()
+
+def clear_chat():
+    # archived messages stay on disk but drop out of the history: it now starts where the archive ends
+    start = max(history_range("chat_history")[1], history_archive("chat_history").count)
+    st.session_state.archived = {**st.session_state.archived, "chat_history": [start, start]}
+    st.session_state.chat_history=ChatLog(); st.session_state.topic_memory=None; st.session_state.chat_summary=None; st.session_state.summary_state=None; st.session_state.chat_pages=1
+    save_state_local()
+    st.session_state.chat_cleared = True
+
+@fragment
+def mentor_panel():
+    for col, (label, prompt, mode) in zip(st.columns(len(QUICK_PROMPTS)), QUICK_PROMPTS):
+        col.button(label, on_click=quick_ask, args=(prompt, mode))
+
+    rc = reply_cache().stats()
+    st.markdown(f"<div class='small-muted'>Reply cache: {rc['hit_rate']:.0%} hit rate ({rc['hits'] + rc['disk_hits']} hits / {rc['misses']} misses)</div>", unsafe_allow_html=True)
+    st.markdown("")
+    st.button("🧹 Clear Chat", on_click=clear_chat)
+    if st.session_state.pop("chat_cleared", False):
+        st.success("Cleared chat.")
+
+    # Chat area: a nested fragment that polls on its own while background replies/TTS are in flight
+    if st.session_state.jobs and hasattr(st, "fragment"):
+        fragment(chat_panel, run_every=JOB_POLL_S)(polling=True)
+    else:
+        chat_panel()
+
+    # input
+    with st.form("chat_form", clear_on_submit=True):
+        st.text_input("Ask the AI mentor (type 'bye' to clear memory)", key="chat_input")
+        st.form_submit_button("Send", on_click=send_chat)
+
+    st.markdown("---")
+    first, hot = history_range("chat_history")
+    if st.session_state.chat_history or first < hot:
+        st.markdown("**💾 Export chat**")
+        # the copy shares the columnar base: O(new messages), and later appends don't leak into the file
+        chat_now, chat_archive = st.session_state.chat_history.copy(), history_archive("chat_history")
+        export_buttons("chat", lambda: chain(archived_rows(chat_archive, "chat", first, hot), chat_rows(chat_now)),
+                       "chat_history", "export_chat")
+
+def ask_about_course(course):
+    comp = course_lookup().completion(course)
+    ask_mentor(f"Give a short study plan for {course} at {comp}% completion.", mode=st.session_state.assistant_mode, cacheable=True)
+    save_state_local()
+    st.session_state.asked_course = course
+
+@fragment
+def course_quick_actions(course_names):
+    st.markdown("<div style='padding:6px 0'>Quick actions</div>", unsafe_allow_html=True)
+    ask_course = st.selectbox("Course", course_names, key="ask_ai_course", label_visibility="collapsed")
+    st.button("Ask AI", key="ask_ai", on_click=ask_about_course, args=(ask_course,), disabled=ask_course is None)
+    asked = st.session_state.pop("asked_course", None)
+    if asked:
+        st.success(f"Asked about {asked}: the plan is on the 🤖 AI Mentor page.")
+
 # ------------------ Floating Manage button (UI only) ------------------
 manage_button = st.empty()
 
@@ -336,6 +943,12 @@ if page == "🏠 Dashboard":
         st.markdown("<div class='small-muted'>Track progress, use the AI mentor, preserve notes & reflect with Spectorial mode.</div>", unsafe_allow_html=True)
     st.markdown("---")
 
+    watched = import_watched_folder()
+    if watched:
+        st.session_state.import_result = watched
+    if st.session_state.get("import_result"):
+        show_import_result(st.session_state.pop("import_result"))
+
     # top metrics row
     c1, c2, c3 = st.columns([1.6,1,1])
     overall = int(st.session_state.courses["Completion"].mean())
@@ -360,23 +973,44 @@ if page == "🏠 Dashboard":
                 status = st.selectbox("Status",["Not Started","In Progress","Completed"], index=1)
                 sub = st.form_submit_button("Add")
                 if sub:
-                    st.session_state.courses = pd.concat([st.session_state.courses, pd.DataFrame([{"Course":n,"Completion":int(cperc),"Status":status}])], ignore_index=True)
-                    st.session_state.show_add_course = False
-                    save_state_local()
-                    st.success(f"Added {n}")
+                    # same upsert as a bulk import: an existing course of that name is updated, not duplicated
+                    valid, _, _ = validate(pd.DataFrame([{"Course": n, "Completion": int(cperc), "Status": status}]))
+                    if valid.empty:
+                        st.warning("Enter a course name.")
+                    else:
+                        merged, counts, changes = merge_courses(st.session_state.courses, valid)
+                        st.session_state.courses = merged
+                        progress_log().record_many(changes)
+                        st.session_state.course_editor_rev += 1
+                        st.session_state.show_add_course = False
+                        save_state_local()
+                        st.success(f"Added {n}" if counts["inserted"] else f"Updated {n}")
+        with st.expander("📥 Import courses"):
+            upload = st.file_uploader("CSV, JSON or NDJSON (.gz ok)", type=IMPORT_TYPES, accept_multiple_files=True, key="course_import_files")
+            if upload and st.button("Import", key="course_import"):
+                st.session_state.import_result = import_courses([(f.name, f.getvalue()) for f in upload])
+                st.rerun()
+            st.caption(f"Or drop files into `{import_dir(current_user())}/`.")
 
     st.markdown("---")
 
-    # Weekly progress with four donuts
+    # Weekly progress with four donuts: average completion at the end of each of the last four weeks
     st.subheader("📆 Weekly Progress")
-    weeks = ["Week 1","Week 2","Week 3","Week 4"]
-    # create pseudo-values for weekly donuts (closer to image)
-    wvals = [int(np.clip(overall - 5*i + random.randint(-3,6), 6, 96)) for i in range(4)]
+    plog = progress_log()
+    course_names = st.session_state.courses["Course"].tolist()
+    plog.ensure_baseline(zip(course_names, st.session_state.courses["Completion"].tolist()))
+    weeks = week_boundaries(4)
+    wvals = plog.overall_at(course_names, [end for _, end in weeks])
     wcols = st.columns(4)
     for i, col in enumerate(wcols):
         with col:
-            figw = multicolor_donut(wvals[i], size=180, title=f"{weeks[i]}")
+            title = f"Week {weeks[i][0]}" if wvals[i] is not None else f"Week {weeks[i][0]} (no data)"
+            figw = multicolor_donut(int(round(wvals[i] or 0)), size=180, title=title)
             st.plotly_chart(figw, use_container_width=True, config={"displayModeBar": False})
+    day_starts, day_changes = plog.daily_changes(PROGRESS_DAYS)
+    if day_changes.any():
+        st.caption(f"Net completion change per day, last {PROGRESS_DAYS} days")
+        st.bar_chart(pd.DataFrame({"change": day_changes}, index=pd.to_datetime(day_starts, unit="s")), height=160)
 
     st.markdown("---")
 
@@ -397,7 +1031,9 @@ if page == "🏠 Dashboard":
             df = df[mask]
         # show compact course cards
         for idx, row in df.iterrows():
-            st.markdown(f"<div class='small-card'><b style='color:#bfffc2'>{row['Course']}</b> — <small style='color:#8fffbf'>{row['Status']}</small><div style='margin-top:6px;color:#9fffd2'>Completion: {int(row['Completion'])}%</div></div>", unsafe_allow_html=True)
+            week_change = plog.course_change(row['Course'], days=7)
+            trend = f" <small style='color:#8fffbf'>({week_change:+d} this week)</small>" if week_change else ""
+            st.markdown(f"<div class='small-card'><b style='color:#bfffc2'>{row['Course']}</b> — <small style='color:#8fffbf'>{row['Status']}</small><div style='margin-top:6px;color:#9fffd2'>Completion: {int(row['Completion'])}%{trend}</div></div>", unsafe_allow_html=True)
 
     # middle: showcase three big donuts summarizing top courses (mimicking image)
     with mid:
@@ -407,49 +1043,50 @@ if page == "🏠 Dashboard":
             f = multicolor_donut(int(r['Completion']), size=130, title=r['Course'], colors=["#00ffb2","#00d1ff","#ff6bcb"])
             st.plotly_chart(f, use_container_width=True, config={"displayModeBar": False})
 
-    # right column: sliders and actions
+    # right column: actions (progress is edited in the table below, all changes at once)
     with right:
-        st.markdown("<div style='padding:6px 0'>Quick actions</div>", unsafe_allow_html=True)
-        # iterate and create sliders for each course (compact)
-        for i, row in st.session_state.courses.reset_index().iterrows():
-            label = f"{row['Course']} ({int(row['Completion'])}%)"
-            new = st.slider(label, 0, 100, int(row['Completion']), key=f"slider_{i}", help="Adjust progress",)
-            if new != int(row['Completion']):
-                st.session_state.courses.at[row['index'], 'Completion'] = int(new)
-                st.session_state.courses.at[row['index'], 'Status'] = 'Completed' if new==100 else ('Not Started' if new==0 else 'In Progress')
-                save_state_local()
-                st.experimental_rerun()
-            # small AI action
-            if st.button("Ask AI", key=f"ask_ai_{i}"):
-                prompt = f"Give a short study plan for {row['Course']} at {row['Completion']}% completion."
-                st.session_state.chat_history.append({"sender":"user","message":prompt,"ts":now_iso()})
-                reply = simulated_llm_reply(prompt, mode=st.session_state.assistant_mode)
-                st.session_state.chat_history.append({"sender":"bot","message":reply,"ts":now_iso()})
-                if st.session_state.use_tts and TTS_AVAILABLE:
-                    audio = tts_speak_bytes(reply)
-                    if audio:
-                        st.audio(audio, format='audio/mp3')
-                save_state_local()
-                st.experimental_rerun()
+        course_quick_actions(course_names)
 
     st.markdown("</div>", unsafe_allow_html=True)
     st.markdown("---")
 
-    # Detailed table
+    # Detailed table: edits are collected in the form and applied together on submit
     st.subheader("📈 Detailed Course Progress")
-    try:
-        st.dataframe(st.session_state.courses.style.format({'Completion':'{:.0f}'}), use_container_width=True)
-    except Exception:
-        st.dataframe(st.session_state.courses, use_container_width=True)
+    with st.form("course_editor"):
+        edited = st.data_editor(
+            st.session_state.courses[["Course", "Completion", "Status"]],
+            key=f"course_editor_{st.session_state.course_editor_rev}",
+            disabled=["Course", "Status"],
+            num_rows="fixed",
+            hide_index=True,
+            use_container_width=True,
+            column_config={"Completion": st.column_config.NumberColumn("Completion", min_value=0, max_value=100, step=1, format="%d%%")},
+        )
+        if st.form_submit_button("Apply changes"):
+            changed = apply_course_edits(edited)
+            if changed:
+                st.rerun()
+            st.info("No changes to apply.")
+
+    # per-module breakdown for courses with a syllabus file in lpd/courses/
+    syllabus = get_syllabus()
+    with_syllabus = [c for c in course_names if syllabus.get(c)]
+    if with_syllabus:
+        with st.expander("📖 Syllabus progress"):
+            sel = st.selectbox("Course", with_syllabus, key="syllabus_course")
+            course = syllabus.get(sel)
+            comp = course_lookup().completion(sel)
+            for i, (module, done) in enumerate(zip(course["modules"], module_completion(course, comp))):
+                st.progress(int(done), text=f"{i + 1}. {module['title']} — {int(done)}%")
+            if st.checkbox("Show lessons", key="syllabus_lessons"):
+                for i, module in enumerate(course["modules"]):
+                    lessons = read_lessons(course, i)  # read from the file on demand, not kept in the index
+                    st.markdown(f"**{module['title']}**")
+                    st.markdown("\n".join(f"- {l}" for l in lessons) if lessons else "_No lessons listed._")
 
-    # export buttons
-    dl1, dl2 = st.columns(2)
-    with dl1:
-        csv = st.session_state.courses.to_csv(index=False).encode("utf-8")
-        st.download_button("⬇️ Export CSV", data=csv, file_name="courses.csv", mime="text/csv")
-    with dl2:
-        j = st.session_state.courses.to_json(orient="records", indent=2).encode("utf-8")
-        st.download_button("⬇️ Export JSON", data=j, file_name="courses.json", mime="application/json")
+    # export buttons: files are built only when a button is clicked
+    courses_now = st.session_state.courses
+    export_buttons("courses", lambda: course_rows(courses_now), "courses", "export_courses")
 
     st.markdown("---")
     st.markdown("<div style='color:#bfffc2'>Developed by Anish • AI Mentor (Ultimate) © 2025</div>", unsafe_allow_html=True)
@@ -463,143 +1100,121 @@ elif page == "🤖 AI Mentor":
     st.markdown("<div class='neon-header'>🤖 AI Mentor</div>", unsafe_allow_html=True)
     st.markdown("<div class='card'>Ask the mentor, choose modes, and use quick actions. Offline fallback active if no API is configured.</div>", unsafe_allow_html=True)
     st.markdown("")
-    q1,q2,q3,q4 = st.columns(4)
-    if q1.button("💪 Motivate Me"):
-        st.session_state.chat_history.append({"sender":"user","message":"motivate me","ts":now_iso()})
-        r = simulated_llm_reply("motivate me", mode="Motivator")
-        st.session_state.chat_history.append({"sender":"bot","message":r,"ts":now_iso()})
-        save_state_local(); st.experimental_rerun()
-    if q2.button("🐍 Python Tip"):
-        st.session_state.chat_history.append({"sender":"user","message":"tell me about python","ts":now_iso()})
-        r = simulated_llm_reply("tell me about python", mode="Tutor")
-        st.session_state.chat_history.append({"sender":"bot","message":r,"ts":now_iso()})
-        save_state_local(); st.experimental_rerun()
-    if q3.button("🧠 AI Info"):
-        st.session_state.chat_history.append({"sender":"user","message":"tell me about ai","ts":now_iso()})
-        r = simulated_llm_reply("tell me about ai", mode="Tutor")
-        st.session_state.chat_history.append({"sender":"bot","message":r,"ts":now_iso()})
-        save_state_local(); st.experimental_rerun()
-    if q4.button("🌐 Web Help"):
-        st.session_state.chat_history.append({"sender":"user","message":"help with web dev","ts":now_iso()})
-        r = simulated_llm_reply("help with web dev", mode="Tutor")
-        st.session_state.chat_history.append({"sender":"bot","message":r,"ts":now_iso()})
-        save_state_local(); st.experimental_rerun()
-
-    st.markdown("")
-    if st.button("🧹 Clear Chat"):
-        st.session_state.chat_history=[]; st.session_state.topic_memory=None; st.session_state.chat_summary=None
-        save_state_local(); st.success("Cleared chat.")
-
-    # Chat area
-    st.markdown("<div class='card'>", unsafe_allow_html=True)
-    if st.session_state.chat_summary and st.session_state.use_memory:
-        st.markdown(f"<div class='memory-badge'>🧠 Memory: {st.session_state.chat_summary}</div>", unsafe_allow_html=True)
-    for m in st.session_state.chat_history:
-        sender = m.get("sender"); msg = m.get("message"); ts = m.get("ts")
-        tstr = pd.Timestamp(ts).strftime("%Y-%m-%d %H:%M:%S UTC")
-        if sender == "user":
-            st.markdown(f"<div style='text-align:right'><div class='bubble-user'><b>You:</b> {msg}</div><div class='small-muted' style='text-align:right'>{tstr}</div></div>", unsafe_allow_html=True)
-        else:
-            st.markdown(f"<div style='text-align:left'><div class='bubble-bot'><b>Assistant:</b> {msg}</div><div class='small-muted'>{tstr}</div></div>", unsafe_allow_html=True)
-    if st.session_state.typing:
-        st.markdown("<div class='small-muted'>Assistant is typing...</div>", unsafe_allow_html=True)
-    st.markdown("</div>", unsafe_allow_html=True)
-
-    # input
-    with st.form("chat_form", clear_on_submit=True):
-        user_text = st.text_input("Ask the AI mentor (type 'bye' to clear memory)")
-        submitted = st.form_submit_button("Send")
-        if submitted and user_text and user_text.strip():
-            st.session_state.chat_history.append({"sender":"user","message":user_text.strip(),"ts":now_iso()})
-            reply = simulated_llm_reply(user_text.strip(), mode=st.session_state.assistant_mode)
-            st.session_state.chat_history.append({"sender":"bot","message":reply,"ts":now_iso()})
-            if st.session_state.use_tts and TTS_AVAILABLE:
-                audio = tts_speak_bytes(reply)
-                if audio:
-                    st.audio(audio, format='audio/mp3')
-            if st.session_state.use_memory:
-                st.session_state.chat_summary = summarize_memory()
-            save_state_local()
-            st.experimental_rerun()
-
-    st.markdown("---")
-    if st.button("💾 Save Chat CSV"):
-        if st.session_state.chat_history:
-            df = pd.DataFrame(st.session_state.chat_history)
-            b = df.to_csv(index=False).encode("utf-8")
-            st.download_button("⬇️ Download chat", data=b, file_name="chat_history.csv", mime="text/csv")
-        else:
-            st.info("No chat yet.")
+    mentor_panel()
 
 # ------------------ Notes Page ------------------
 elif page == "📝 Notes":
     st.markdown("<div class='neon-header'>📝 Notes</div>", unsafe_allow_html=True)
     st.markdown("<div class='card'>Quick note-taking. Notes persist to local JSON.</div>", unsafe_allow_html=True)
-    with st.form("note_form", clear_on_submit=True):
-        title = st.text_input("Title")
-        body = st.text_area("Body")
-        s = st.form_submit_button("Add Note")
-        if s and (title.strip() or body.strip()):
+    def add_note():
+        title, body = st.session_state.get("note_title", ""), st.session_state.get("note_body", "")
+        if title.strip() or body.strip():
             st.session_state.notes.append({"title":title,"body":body,"ts":now_iso()})
-            save_state_local(); st.success("Note saved."); st.experimental_rerun()
-    if st.session_state.notes:
-        for n in reversed(st.session_state.notes[-30:]):
-            st.markdown(f"**{n['title']}** — <span class='small-muted'>{n['ts']}</span>", unsafe_allow_html=True)
-            st.write(n['body']); st.markdown("---")
-    else:
-        st.info("No notes yet.")
+            save_state_local()
+            st.session_state.note_saved = True
+
+    # adding, searching and reading notes rerun only this region
+    @fragment
+    def notes_panel():
+        with st.form("note_form", clear_on_submit=True):
+            st.text_input("Title", key="note_title")
+            st.text_area("Body", key="note_body")
+            st.form_submit_button("Add Note", on_click=add_note)
+        if st.session_state.pop("note_saved", False):
+            st.success("Note saved.")
+        search_sources = st.multiselect("Search in", list(SOURCES), default=list(SOURCES), format_func=SOURCES.get)
+        search_panel("Search notes, reflections and chat", search_sources, key="notes_search")
+        if st.session_state.notes:
+            notes_now, notes_count = st.session_state.notes, len(st.session_state.notes)
+            notes_cold, notes_archive = history_range("notes"), history_archive("notes")
+            with st.expander("⬇️ Export notes"):
+                export_buttons("notes", lambda: chain(archived_rows(notes_archive, "notes", *notes_cold),
+                                                      entry_rows(notes_now, "notes", notes_count)), "notes", "export_notes")
+            for n in reversed(st.session_state.notes[-30:]):
+                st.markdown(f"**{n['title']}** — <span class='small-muted'>{n['ts']}</span>", unsafe_allow_html=True)
+                st.write(n['body']); st.markdown("---")
+        else:
+            st.info("No notes yet.")
+
+    notes_panel()
 
 # ------------------ Quizzes Page ------------------
 elif page == "🧪 Quizzes":
     st.markdown("<div class='neon-header'>🧪 Quizzes</div>", unsafe_allow_html=True)
     st.markdown("<div class='card'>Short quizzes are generated from your courses. Try one and save your score.</div>", unsafe_allow_html=True)
-    top_course = st.session_state.courses.loc[st.session_state.courses['Completion'].idxmax()]['Course']
-    st.markdown(f"**Suggested course for quiz:** {top_course}")
-    if st.button("Generate 3-question quiz"):
-        quiz = [
-            {"q":f"What is a common data structure used in {top_course} to implement FIFO?", "a":"queue"},
-            {"q":f"In Python, which keyword defines a function?", "a":"def"},
-            {"q":f"What complexity (big-O) is average-case for binary search?", "a":"logarithmic"}
-        ]
-        st.session_state.current_quiz = quiz
-        st.experimental_rerun()
-    if st.session_state.get("current_quiz"):
+    top_course, top_comp = course_lookup().top
+    st.markdown(f"**Suggested course for quiz:** {top_course}." + next_module_hint(top_course, top_comp))
+    course_names = st.session_state.courses["Course"].tolist()
+    quiz_course = st.selectbox("Course", course_names, index=course_names.index(top_course), key="quiz_course")
+    if st.button(f"Generate {QUIZ_SIZE}-question quiz"):
+        # a quiz is the course plus sampled question indices into its bank (see quiz.py)
+        st.session_state.current_quiz = {"course": quiz_course, "items": get_bank(quiz_course).sample(QUIZ_SIZE)}
+        for i in range(QUIZ_SIZE):
+            st.session_state.pop(f"quiz_in_{i}", None)
+        st.rerun()
+    quiz = st.session_state.get("current_quiz")
+    if quiz:
+        bank = get_bank(quiz["course"])
         answers = []
-        for i, qa in enumerate(st.session_state.current_quiz):
-            ans = st.text_input(f"Q{i+1}: {qa['q']}", key=f"quiz_in_{i}")
+        for i, q in enumerate(quiz["items"]):
+            ans = st.text_input(f"Q{i+1}: {bank.questions[q]}", key=f"quiz_in_{i}")
             answers.append(ans)
         if st.button("Submit Quiz"):
-            score = 0
-            for i, qa in enumerate(st.session_state.current_quiz):
-                if answers[i] and qa['a'] in answers[i].lower():
-                    score += 1
-            st.session_state.quiz_scores[top_course] = st.session_state.quiz_scores.get(top_course, []) + [{"score": score, "ts": now_iso()}]
-            save_state_local()
-            st.success(f"Score: {score}/{len(st.session_state.current_quiz)}")
+            score = bank.score(quiz["items"], answers)
+            score_log().record(quiz["course"], score, len(quiz["items"]))
+            # modules of this course to go back to, matched on the questions that were missed
+            missed = [bank.questions[q] for q, a in zip(quiz["items"], answers) if not bank.check(q, a)]
+            review = list(dict.fromkeys(filter(None, (module_hint(q, quiz["course"]) for q in missed))))
+            st.session_state.last_quiz_result = (quiz["course"], score, [bank.answers[q] for q in quiz["items"]], review)
             del st.session_state.current_quiz
-            st.experimental_rerun()
-    if st.session_state.quiz_scores:
+            st.rerun()
+    if st.session_state.get("last_quiz_result"):
+        course, score, expected, review = st.session_state.last_quiz_result
+        st.success(f"{course} — score: {score}/{len(expected)}. Answers: {', '.join(expected)}")
+        if review:
+            st.info("Review: " + "; ".join(review))
+    scores = score_log()
+    summary_df = quiz_summary(scores, course_names)
+    if summary_df is not None:
         st.markdown("### Past Scores")
-        st.write(st.session_state.quiz_scores)
+        st.dataframe(summary_df, hide_index=True, use_container_width=True)
+        with st.expander("⬇️ Export attempts"):
+            export_buttons("quiz", lambda: quiz_rows(scores, course_names), "quiz_attempts", "export_quiz")
 
 # ------------------ Code Runner Page ------------------
 elif page == "🧪 Code Runner":
     st.markdown("<div class='neon-header'>🧪 Code Runner</div>", unsafe_allow_html=True)
     st.markdown("<div class='card'>Run short Python snippets on this machine. ⚠️ Enable only in trusted environments.</div>", unsafe_allow_html=True)
     st.markdown("**Enable execution toggle** in the sidebar to run code.")
-    code = st.text_area("Enter Python code", value='print(\"Hello, world!\")', height=220)
-    if st.session_state.enable_code_exec:
-        if st.button("Run (5s timeout)"):
-            out, err, to = run_code_snippet(code, timeout=5)
-            if to:
-                st.error("Execution timed out.")
-            else:
-                if out:
-                    st.code(out)
-                if err:
-                    st.error(err)
-    else:
-        st.info("Code execution is disabled. Toggle 'Enable Code Execution' in the sidebar to run (unsafe).")
+    # editing and running code reruns only this region
+    @fragment
+    def code_runner_panel():
+        code = st.text_area("Enter Python code", value='print(\"Hello, world!\")', height=220)
+        if st.session_state.enable_code_exec:
+            pool = code_pool() if pool_supported() else None  # first visit starts the workers
+            if st.button("Run (5s timeout)"):
+                out, err, to = run_code_snippet(code, timeout=5)
+                if to:
+                    st.error("Execution timed out.")
+                else:
+                    if out:
+                        st.code(out)
+                    if err:
+                        st.error(err)
+                last = st.session_state.get("last_code_run") or {}
+                if last.get("truncated"):
+                    st.warning("Output was truncated.")
+                if last.get("latency") is not None:
+                    st.caption(f"Ran in {last['latency']*1000:.0f} ms (queued {last['wait']*1000:.0f} ms)")
+            if pool is not None:
+                ps = pool.stats()
+                if ps["runs"]:
+                    st.caption(f"Runner pool: {ps['idle']}/{pool.size} idle • p50 {ps['p50']*1000:.0f} ms • "
+                               f"p95 {ps['p95']*1000:.0f} ms • {ps['throughput']*60:.0f} runs/min")
+        else:
+            st.info("Code execution is disabled. Toggle 'Enable Code Execution' in the sidebar to run (unsafe).")
+
+    code_runner_panel()
 
 # ------------------ Spectorial Mode ------------------
 elif page == "🌌 Spectorial":
@@ -610,11 +1225,70 @@ elif page == "🌌 Spectorial":
     if st.button("Save Entry"):
         st.session_state.spectorial_entries.append({"prompt":prompt,"entry":entry,"ts":now_iso()})
         save_state_local(); st.success("Saved.")
+    search_panel("Search reflections", ["spectorial_entries"], key="spectorial_search")
     if st.session_state.spectorial_entries:
+        entries_now, entries_count = st.session_state.spectorial_entries, len(st.session_state.spectorial_entries)
+        entries_cold, entries_archive = history_range("spectorial_entries"), history_archive("spectorial_entries")
+        with st.expander("⬇️ Export reflections"):
+            export_buttons("spectorial", lambda: chain(archived_rows(entries_archive, "spectorial", *entries_cold),
+                                                       entry_rows(entries_now, "spectorial", entries_count)),
+                           "spectorial_entries", "export_spectorial")
         st.markdown("### Past Entries")
         for e in reversed(st.session_state.spectorial_entries[-15:]):
             st.markdown(f"**{e['prompt']}** — <span class='small-muted'>{e['ts']}</span>", unsafe_allow_html=True)
             st.write(e['entry']); st.markdown("---")
 
+# ------------------ Diagnostics (hidden) ------------------
+elif page == "🩺 Diagnostics":
+    st.markdown("<div class='neon-header'>🩺 Diagnostics</div>", unsafe_allow_html=True)
+    st.caption("Timings of this server process over all sessions. Reruns cut short by st.rerun() are not counted in the page timings.")
+    snap = REGISTRY.snapshot()
+    if snap["timers"]:
+        rows = [{"Section": name, "Count": t["count"], "Mean ms": t["mean"] * 1000, "p50 ms": t["p50"] * 1000,
+                 "p95 ms": t["p95"] * 1000, "Max ms": t["max"] * 1000} for name, t in snap["timers"].items()]
+        st.dataframe(pd.DataFrame(rows).round(2), hide_index=True, use_container_width=True)
+    else:
+        st.info("Nothing timed yet.")
+    st.markdown("**Counters**")
+    st.json(snap["counters"])
+    user = current_user()
+    st.markdown("**Memory**")
+    mem = snap["memory"]
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Process RSS", f"{mem['process_rss_bytes'] / 2**20:.0f} MiB" if mem["process_rss_bytes"] else "n/a")
+    m2.metric("Active sessions", mem["active_sessions"])
+    m3.metric("RSS per session", f"{mem['rss_bytes_per_session'] / 2**20:.1f} MiB" if mem["rss_bytes_per_session"] else "n/a")
+    st.caption(f"Budget {SESSION_BUDGET_KB} KB of history per session; sessions count as active for {SESSION_TTL / 60:.0f} min after their last rerun.")
+    st.dataframe(pd.DataFrame([{"History": SOURCES[key], "In memory": len(st.session_state[key]),
+                                "Est. KB": st.session_state._history_bytes.get(key, 0) / 1024,
+                                "Archived": history_range(key)[1] - history_range(key)[0],
+                                "Archive KB": history_archive(key).stats()["bytes"] / 1024} for key in APPEND_KEYS]).round(1),
+                 hide_index=True, use_container_width=True)
+    calls = recent_stats()
+    if calls:
+        st.markdown(f"**Provider calls** (last {len(calls)})")
+        st.dataframe(pd.DataFrame([{"Provider": c["provider"], "OK": c["ok"], "Attempts": c["attempts"],
+                                    "TTFT ms": c["ttft"] * 1000 if c["ttft"] is not None else None,
+                                    "Total ms": c["total"] * 1000 if c["total"] is not None else None,
+                                    "Chars": c["chars"]} for c in reversed(calls)]).round(1),
+                     hide_index=True, use_container_width=True)
+    st.markdown("**Indexes and logs**")
+    st.json({"search": get_index(user).stats(), "progress": progress_log().stats(), "quiz": get_score_log(user).stats()})
+    d1, d2, d3 = st.columns(3)
+    with d1:
+        st.download_button("⬇️ JSON", data=REGISTRY.to_json(), file_name="lpd_metrics.json", mime="application/json")
+    with d2:
+        st.download_button("⬇️ Prometheus", data=REGISTRY.to_prometheus(), file_name="lpd_metrics.prom", mime="text/plain")
+    with d3:
+        if st.button("Reset"):
+            REGISTRY.reset()
+            st.rerun()
+
 # ------------------ Footer ------------------
 st.markdown("<div style='text-align:center; color:#bfffc2; margin-top:18px'> Learning Path •  Dashboard — Built 2025</div>", unsafe_allow_html=True)
+observe(f"page {page}", time.perf_counter() - PAGE_STARTED)
+# this session's hot histories and course frame as of its last load/save, for the per-session memory report
+REGISTRY.track_session(st.session_state._session_id, sum(st.session_state._history_bytes.values()))
+observe("rerun", time.perf_counter() - RERUN_STARTED)
+if METRICS_FILE:
+    REGISTRY.maybe_dump(METRICS_FILE)
@@ -0,0 +1,155 @@
+"""
+Lazy, chunked exports of the user's data.
+
+Nothing here runs on a rerun: the dashboard hands st.download_button a
+callable (see export_bytes), and Streamlit calls it only when the button is
+clicked. Records are generated straight from what the session already holds
+(the course frame, the chat log's Arrow base, the notes and reflections
+lists, the quiz score log) or from the cold history archive one block at a
+time, and encoded CHUNK rows at a time, so the only full copy is the output
+Streamlit serves; no DataFrame or list of the whole export is built on the
+way.
+
+Formats: csv, json (an indented array, as before), ndjson.gz and parquet
+(pyarrow, optional).
+"""
+
+import io
+import csv
+import gzip
+import json
+from itertools import islice
+from datetime import datetime, timezone
+
+from progress import course_id
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # parquet exports are not offered
+    pa = None
+
+PARQUET_AVAILABLE = pa is not None
+CHUNK = 5000
+
+# kind -> columns, in export order
+COLUMNS = {
+    "courses": ("Course", "Completion", "Status"),
+    "chat": ("sender", "message", "ts"),
+    "notes": ("title", "body", "ts"),
+    "spectorial": ("prompt", "entry", "ts"),
+    "quiz": ("course", "score", "total", "ts"),
+}
+MIME = {"csv": "text/csv", "json": "application/json", "ndjson.gz": "application/gzip",
+        "parquet": "application/vnd.apache.parquet"}
+
+
+def formats(kind):
+    out = ["csv", "json", "ndjson.gz"] if kind == "courses" else ["ndjson.gz", "csv"]
+    return out + (["parquet"] if PARQUET_AVAILABLE else [])
+
+
+# ------------------ Record sources ------------------
+def course_rows(df):
+    for course, completion, status in df[list(COLUMNS["courses"])].itertuples(index=False, name=None):
+        yield {"Course": course, "Completion": int(completion), "Status": str(status)}
+
+
+def chat_rows(log, count=None):
+    # slices of the log: only CHUNK messages are materialized at a time
+    n = len(log) if count is None else count
+    for start in range(0, n, CHUNK):
+        for m in log[start:min(start + CHUNK, n)]:
+            yield {"sender": m.sender, "message": m.message, "ts": m.iso}
+
+
+def entry_rows(entries, kind, count=None):
+    cols = COLUMNS[kind]
+    for e in islice(entries, count if count is not None else len(entries)):
+        yield {c: e.get(c, "") for c in cols}
+
+
+def archived_rows(archive, kind, start, stop):
+    # entries [start, stop) from the cold archive (see archive.py), decompressed one block at a time
+    cols = COLUMNS[kind]
+    for block in archive.iter_blocks(start, stop):
+        for rec in block:
+            if kind == "chat":
+                yield {"sender": rec.get("sender"), "message": rec.get("message", ""),
+                       "ts": datetime.fromtimestamp(rec["ts"] / 1000, timezone.utc).isoformat()}
+            else:
+                yield {c: rec.get(c, "") for c in cols}
+
+
+def quiz_rows(score_log, course_names):
+    names = {course_id(n): n for n in course_names}
+    ev = score_log.events
+    for start in range(0, len(ev), CHUNK):
+        chunk = ev[start:start + CHUNK]
+        for ts, cid, score, total in zip(chunk["ts"].tolist(), chunk["course"].tolist(),
+                                         chunk["score"].tolist(), chunk["total"].tolist()):
+            yield {"course": names.get(cid, f"#{cid & 0xFFFFFFFF:08x}"), "score": score, "total": total,
+                   "ts": datetime.fromtimestamp(ts, timezone.utc).isoformat()}
+
+
+# ------------------ Writers ------------------
+def _batches(rows):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, CHUNK))
+        if not batch:
+            return
+        yield batch
+
+
+def write_ndjson_gz(rows, out):
+    # mtime=0: the same data always gives the same bytes
+    with gzip.GzipFile(fileobj=out, mode="wb", compresslevel=6, mtime=0) as gz:
+        for batch in _batches(rows):
+            gz.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in batch).encode("utf-8"))
+
+
+def write_csv(rows, out, columns):
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+    writer = csv.DictWriter(text, fieldnames=columns, lineterminator="\n")
+    writer.writeheader()
+    for batch in _batches(rows):
+        writer.writerows(batch)
+    text.detach()  # leave `out` open for the caller
+
+
+def write_json(rows, out):
+    # the indented array the old "Export JSON" produced, written record by record
+    sep = b"[\n  "
+    for r in rows:
+        out.write(sep + json.dumps(r, ensure_ascii=False, indent=2).replace("\n", "\n  ").encode("utf-8"))
+        sep = b",\n  "
+    out.write(b"[]" if sep.startswith(b"[") else b"\n]")
+
+
+def write_parquet(rows, out, columns):
+    writer = None
+    for batch in _batches(rows):
+        table = pa.Table.from_pylist(batch).select(list(columns))
+        if writer is None:
+            writer = pq.ParquetWriter(out, table.schema, compression="zstd")
+        writer.write_table(table.cast(writer.schema))
+    if writer is None:
+        writer = pq.ParquetWriter(out, pa.schema([(c, pa.string()) for c in columns]), compression="zstd")
+    writer.close()
+
+
+def export_bytes(rows, fmt, columns):
+    """rows (an iterator of dicts) encoded as `fmt`."""
+    out = io.BytesIO()
+    if fmt == "ndjson.gz":
+        write_ndjson_gz(rows, out)
+    elif fmt == "csv":
+        write_csv(rows, out, columns)
+    elif fmt == "json":
+        write_json(rows, out)
+    elif fmt == "parquet":
+        write_parquet(rows, out, columns)
+    else:
+        raise ValueError(f"unknown export format: {fmt}")
+    return out.getvalue()
@@ -0,0 +1,204 @@
+"""
+Bulk course import from CSV, JSON or NDJSON files (optionally gzipped).
+
+Files come from the uploader on the Dashboard or from a watched folder
+(IMPORT_DIR next to the state, per user, see store.user_state_path). Each
+file is read into a DataFrame and validated column-wise in one pass, so a
+file-level problem (say, no course column) fails that file alone; the valid
+rows of all files are then deduplicated by course name (case-insensitive,
+last row wins) and upserted into the course table with one index lookup and
+one concat, so the caller records progress and persists once per import,
+not per row.
+
+Accepted columns (case-insensitive): Course/name/title, Completion/progress/
+percent ("45" or "45%"), Status. A missing completion keeps an existing
+course's value (0 for a new one); a missing status is derived from the
+completion like the course editor does.
+"""
+
+import io
+import os
+import gzip
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from store import user_state_path
+from columns import STATUSES, course_frame, status_for
+
+IMPORT_DIR = "cse_dashboard_imports"
+SUFFIXES = (".csv", ".json", ".ndjson", ".jsonl")
+ALIASES = {"course": "Course", "name": "Course", "title": "Course",
+           "completion": "Completion", "progress": "Completion", "percent": "Completion",
+           "status": "Status"}
+_STATUS_LOOKUP = {s.lower(): s for s in STATUSES}
+
+
+def importable(name):
+    name = name.lower()
+    return (name[:-3] if name.endswith(".gz") else name).endswith(SUFFIXES)
+
+
+# ------------------ Reading ------------------
+def read_table(data, name):
+    """File contents -> DataFrame with the columns renamed to Course/Completion/Status; ValueError if unreadable."""
+    name = name.lower()
+    if name.endswith(".gz"):
+        data, name = gzip.decompress(data), name[:-3]
+    if name.endswith(".csv"):
+        df = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False, skipinitialspace=True)
+    elif name.endswith((".ndjson", ".jsonl")):
+        df = pd.read_json(io.BytesIO(data), lines=True, dtype=False)
+    elif name.endswith(".json"):
+        obj = json.loads(data)
+        if isinstance(obj, dict):
+            obj = obj.get("courses", [obj])
+        df = pd.DataFrame(obj)
+    else:
+        raise ValueError(f"unsupported file type: {name}")
+    return df.rename(columns=lambda c: ALIASES.get(str(c).strip().lower(), c))
+
+
+# ------------------ Validation ------------------
+def validate(df):
+    """
+    One vectorized pass over the rows.
+    Returns (valid, rejected, duplicates): valid has Course, Completion (float, NaN = not given) and
+    Status (None = derive); rejected keeps the original columns plus "row" (1-based) and "reason".
+    """
+    if "Course" not in df.columns:
+        raise ValueError("no course column (expected Course, name or title)")
+    n = len(df)
+    course = df["Course"].astype("string").str.strip()
+    bad_name = (course.isna() | (course == "")).to_numpy(dtype=bool)
+
+    if "Completion" in df.columns:
+        raw = df["Completion"].astype("string").str.strip().str.rstrip("%")
+        completion = pd.to_numeric(raw, errors="coerce").to_numpy(dtype=float)
+        given = ~(raw.isna() | (raw == "")).to_numpy(dtype=bool)
+        bad_completion = given & ~((completion >= 0) & (completion <= 100))  # NaN compares False
+    else:
+        completion, bad_completion = np.full(n, np.nan), np.zeros(n, dtype=bool)
+
+    if "Status" in df.columns:
+        raw = df["Status"].astype("string").str.strip().str.lower()
+        status = raw.map(_STATUS_LOOKUP, na_action="ignore").to_numpy(dtype=object)
+        given = ~(raw.isna() | (raw == "")).to_numpy(dtype=bool)
+        bad_status = given & pd.isna(status)
+    else:
+        status, bad_status = np.full(n, None, dtype=object), np.zeros(n, dtype=bool)
+
+    reason = np.select([bad_name, bad_completion, bad_status],
+                       ["missing course name", "completion is not a number from 0 to 100", "unknown status"], "")
+    ok = reason == ""
+    rejected = df[~ok].assign(row=np.flatnonzero(~ok) + 1, reason=reason[~ok])
+
+    valid = pd.DataFrame({"Course": course.to_numpy(dtype=object)[ok], "Completion": completion[ok],
+                          "Status": np.where(pd.isna(status[ok]), None, status[ok])})
+    dup = valid["Course"].str.casefold().duplicated(keep="last").to_numpy()
+    return valid[~dup].reset_index(drop=True), rejected, int(dup.sum())
+
+
+def validate_files(tables):
+    """
+    validate() per file. tables: [(name, DataFrame)].
+    Returns (valid, rejected, duplicates, failed): valid rows of all files deduplicated across them, rejected rows
+    with a "file" column added, and failed = {name: reason} for the files that could not be validated at all.
+    """
+    valids, rejects, duplicates, failed = [], [], 0, {}
+    for name, df in tables:
+        try:
+            valid, rejected, dup = validate(df)
+        except ValueError as e:
+            failed[name] = str(e)
+            continue
+        valids.append(valid)
+        duplicates += dup
+        if len(rejected):
+            rejects.append(rejected.assign(file=name))
+    if not valids:
+        return None, None, duplicates, failed
+    valid = pd.concat(valids, ignore_index=True)
+    dup = valid["Course"].str.casefold().duplicated(keep="last").to_numpy()
+    rejected = pd.concat(rejects, ignore_index=True) if rejects else valid.iloc[:0]
+    return valid[~dup].reset_index(drop=True), rejected, duplicates + int(dup.sum()), failed
+
+
+# ------------------ Merge ------------------
+def merge_courses(current, incoming):
+    """
+    Upserts validated rows into the course frame by case-insensitive name.
+    Returns (new course frame, counts, changes): counts has inserted/updated/unchanged, changes are
+    (course, new completion, previous completion or None) for the progress log.
+    """
+    names = current["Course"].astype(str).to_numpy(dtype=object)
+    keys = pd.Index(pd.Series(names).str.casefold())
+    first = ~keys.duplicated()  # the first course of a name takes the update
+    pos = pd.Index(keys[first]).get_indexer(incoming["Course"].str.casefold())
+    pos = np.where(pos >= 0, np.flatnonzero(first)[np.maximum(pos, 0)], -1)
+    upd, ins = pos >= 0, pos < 0
+
+    old_completion = current["Completion"].to_numpy(dtype=np.int64, copy=True)
+    old_status = current["Status"].astype(str).to_numpy(dtype=object)
+    given_completion = incoming["Completion"].to_numpy(dtype=float)
+    given_status = incoming["Status"].to_numpy(dtype=object)
+
+    # updates: in place on copies of the columns
+    target = pos[upd]
+    new = np.where(np.isnan(given_completion[upd]), old_completion[target], np.rint(given_completion[upd])).astype(np.int64)
+    new_status = np.where(pd.isna(given_status[upd]), status_for(new), given_status[upd])
+    changed = (new != old_completion[target]) | (new_status != old_status[target])
+    completion, status = old_completion.copy(), old_status.copy()
+    completion[target], status[target] = new, new_status
+
+    # inserts: appended once
+    added = np.nan_to_num(np.rint(given_completion[ins]), nan=0).astype(np.int64)
+    added_status = np.where(pd.isna(given_status[ins]), status_for(added), given_status[ins])
+    added_names = incoming["Course"].to_numpy(dtype=object)[ins]
+
+    frame = course_frame({"Course": np.concatenate([names, added_names]),
+                          "Completion": np.concatenate([completion, added]),
+                          "Status": np.concatenate([status, added_status])})
+    moved = target[new != old_completion[target]]
+    changes = (list(zip(names[moved].tolist(), completion[moved].tolist(), old_completion[moved].tolist()))
+               + list(zip(added_names.tolist(), added.tolist(), [None] * len(added))))
+    counts = {"inserted": int(ins.sum()), "updated": int(changed.sum()), "unchanged": int((~changed).sum())}
+    return frame, counts, changes
+
+
+# ------------------ Watched folder ------------------
+def import_dir(user, path=IMPORT_DIR):
+    return user_state_path(path, user)
+
+
+def claim_files(folder):
+    """
+    Moves every importable file in folder into folder/processing and returns [(original name, new path)].
+    The rename is atomic, so with several processes watching each file is claimed by exactly one.
+    """
+    try:
+        entries = [e for e in os.scandir(folder) if e.is_file() and importable(e.name)]
+    except OSError:
+        return []
+    if not entries:
+        return []
+    work = os.path.join(folder, "processing")
+    os.makedirs(work, exist_ok=True)
+    claimed = []
+    for e in sorted(entries, key=lambda e: e.name):
+        dest = os.path.join(work, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{e.name}")
+        try:
+            os.rename(e.path, dest)
+        except OSError:
+            continue  # another process got it first
+        claimed.append((e.name, dest))
+    return claimed
+
+
+def archive(folder, path, ok):
+    """Moves a processed file to folder/done or folder/failed."""
+    dest_dir = os.path.join(folder, "done" if ok else "failed")
+    os.makedirs(dest_dir, exist_ok=True)
+    os.replace(path, os.path.join(dest_dir, os.path.basename(path)))
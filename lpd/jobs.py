@@ -0,0 +1,130 @@
+"""
+Background jobs for slow work (provider replies, text-to-speech).
+
+One bounded thread pool per process. A job is a plain dict the worker
+updates in place (status, streamed text, result); sessions keep their jobs
+in a table and collect finished ones on a later rerun instead of blocking
+the script while the work runs. Workers must not touch st.session_state:
+everything they need is passed in when the job is submitted.
+"""
+
+import os
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_WORKERS = int(os.environ.get("LPD_JOB_WORKERS", "4"))
+MAX_PENDING = 64
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobPool:
+    def __init__(self, workers=JOB_WORKERS, max_pending=MAX_PENDING):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lpd-job")
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, job, fn, *args):
+        # jobs beyond max_pending are refused rather than queued without bound
+        if not self._slots.acquire(blocking=False):
+            raise QueueFull("too many background jobs queued, try again shortly")
+        future = self._executor.submit(run_job, job, fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+def new_job(kind, **data):
+    job = {"id": uuid.uuid4().hex, "kind": kind, "status": "queued", "text": "",
+           "result": None, "error": None, "created": time.time(), "finished": None}
+    job.update(data)
+    return job
+
+
+def run_job(job, fn, *args):
+    job["status"] = "running"
+    try:
+        job["result"] = fn(job, *args)
+        job["status"] = "done"
+    except Exception as e:
+        job["error"] = str(e)
+        job["status"] = "error"
+    finally:
+        job["finished"] = time.time()
+
+
+def is_finished(job):
+    return job["status"] in ("done", "error")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = JobPool()
+        return _pool
+
+
+# ------------------ Result cache ------------------
+def text_hash(text, *extra):
+    raw = "\x1f".join((text,) + tuple(str(e) for e in extra))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class HashCache:
+    """
+    Thread-safe LRU keyed by text_hash(); used so the same reply is never synthesized twice.
+    Keys being computed map to their job, so a request for the same text shares that job.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._pending = {}  # key -> job computing it
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            self._pending.pop(key, None)
+
+    def claim(self, key, job):
+        """
+        Called before submitting job to compute key. Returns (value, None) if key is cached,
+        (None, other) if job `other` is already computing it, else (None, None): job now owns key
+        until put() or release().
+        """
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+                return value, None
+            other = self._pending.get(key)
+            if other is not None and not is_finished(other):
+                return None, other
+            self._pending[key] = job
+            return None, None
+
+    def release(self, key, job):
+        # the job gave up (failed or never started): the next request computes key again
+        with self._lock:
+            if self._pending.get(key) is job:
+                del self._pending[key]
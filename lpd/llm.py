@@ -0,0 +1,267 @@
+"""
+Chat-completion providers for the AI mentor.
+
+OpenAI and DeepSeek both speak the OpenAI chat-completions protocol, so one
+client covers both. All clients in the process share one pooled
+requests.Session; replies are streamed (server-sent events) and every call is
+bounded by connect/read timeouts and retried with exponential backoff until
+the first token arrives. Time-to-first-token is recorded per call.
+
+LPD_LLM_BASE_URL overrides the provider URL (e.g. a local stub server).
+requests is imported on first use, so sessions without a provider never load it.
+
+ReplyCache keeps replies to repeated prompts (quick actions, "Ask AI") in a
+TTL + LRU memory tier with an optional SQLite tier shared across processes.
+"""
+
+import os
+import re
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import threading
+from collections import deque, OrderedDict
+
+PROVIDERS = {
+    "OpenAI": {"base_url": "https://api.openai.com/v1", "model": "gpt-4o-mini", "key_env": "OPENAI_API_KEY"},
+    "DeepSeek": {"base_url": "https://api.deepseek.com/v1", "model": "deepseek-chat", "key_env": "DEEPSEEK_API_KEY"},
+}
+
+MODE_PROMPTS = {
+    "Tutor": "You are a concise CSE tutor. Give short, concrete study plans and exercises based on the learner's progress.",
+    "Code Helper": "You are a concise coding assistant. Answer with a short explanation and a minimal runnable example.",
+    "Motivator": "You are an upbeat study coach. Reply with one or two short, practical motivational sentences.",
+}
+
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 60.0
+MAX_RETRIES = 3
+BACKOFF = 0.5
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+STREAM_CHUNK = 16
+
+
+class ProviderError(Exception):
+    pass
+
+
+_session = None
+_session_lock = threading.Lock()
+_stats = deque(maxlen=200)
+
+
+def http_session():
+    # one keep-alive pool per process, shared by every Streamlit session
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _session = s
+        return _session
+
+
+def recent_stats():
+    """Most recent call stats (newest last): provider, ttft, total, attempts, chars, ok."""
+    return list(_stats)
+
+
+class ChatClient:
+    def __init__(self, provider, api_key, base_url=None, model=None,
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), retries=MAX_RETRIES, backoff=BACKOFF, session=None):
+        if provider not in PROVIDERS:
+            raise ValueError(f"Unknown provider: {provider}")
+        conf = PROVIDERS[provider]
+        self.provider = provider
+        self.api_key = api_key
+        self.base_url = (base_url or os.environ.get("LPD_LLM_BASE_URL") or conf["base_url"]).rstrip("/")
+        self.model = model or conf["model"]
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = session or http_session()
+        self.last_stats = None
+
+    def _open(self, messages, stats):
+        # retries cover connection failures and retryable statuses; nothing has been shown yet
+        import requests
+        url = f"{self.base_url}/chat/completions"
+        headers = {"Authorization": f"Bearer {self.api_key}", "Accept": "text/event-stream"}
+        body = {"model": self.model, "messages": messages, "stream": True}
+        for attempt in range(1, self.retries + 2):
+            stats["attempts"] = attempt
+            retry_after = None
+            try:
+                resp = self.session.post(url, json=body, headers=headers, stream=True, timeout=self.timeout)
+                if resp.status_code < 400:
+                    return resp
+                detail = resp.text[:200]
+                resp.close()
+                if resp.status_code not in RETRY_STATUS or attempt > self.retries:
+                    raise ProviderError(f"{self.provider} HTTP {resp.status_code}: {detail}")
+                retry_after = resp.headers.get("Retry-After")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt > self.retries:
+                    raise ProviderError(f"{self.provider} unreachable: {e}") from e
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = self.backoff * (2 ** (attempt - 1)) * (1 + random.random() * 0.25)
+            time.sleep(min(delay, 30.0))
+        raise ProviderError(f"{self.provider}: retries exhausted")
+
+    def stream(self, messages):
+        """Yields reply text chunks as they arrive; self.last_stats is filled in when done."""
+        import requests
+        t0 = time.perf_counter()
+        stats = {"provider": self.provider, "ttft": None, "total": None, "attempts": 0, "chars": 0, "ok": False}
+        self.last_stats = stats
+        try:
+            resp = self._open(messages, stats)
+            with resp:
+                # a small fixed read size: chunked responses hand over each chunk as it arrives, but a
+                # Content-Length or HTTP/1.0 body (e.g. a stub server) only returns once the read is full,
+                # and chunk_size=None would buffer such a body whole
+                for line in resp.iter_lines(chunk_size=STREAM_CHUNK, decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    except (ValueError, KeyError, IndexError) as e:
+                        raise ProviderError(f"{self.provider}: malformed stream chunk") from e
+                    if delta:
+                        if stats["ttft"] is None:
+                            stats["ttft"] = time.perf_counter() - t0
+                        stats["chars"] += len(delta)
+                        yield delta
+            stats["ok"] = True
+        except requests.RequestException as e:
+            # read timeout / dropped connection mid-stream: not retried, the partial reply was already shown
+            raise ProviderError(f"{self.provider} stream failed: {e}") from e
+        finally:
+            stats["total"] = time.perf_counter() - t0
+            _stats.append(stats)
+
+
+def build_messages(user_msg, mode, history=(), memory=None, max_history=10):
+    system = MODE_PROMPTS.get(mode, MODE_PROMPTS["Tutor"])
+    if memory:
+        system += f"\nConversation memory: {memory}"
+    messages = [{"role": "system", "content": system}]
+    for m in history[-max_history:]:
+        messages.append({"role": "user" if m.get("sender") == "user" else "assistant", "content": m.get("message", "")})
+    messages.append({"role": "user", "content": user_msg})
+    return messages
+
+
+# ------------------ Reply cache ------------------
+REPLY_TTL = 3600.0
+REPLY_CACHE_SIZE = 512
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(text):
+    return _WS_RE.sub(" ", text.strip().lower())
+
+
+def reply_key(prompt, mode, provider=None, fingerprint=""):
+    raw = "\x1f".join((provider or "offline", mode, normalize_prompt(prompt), str(fingerprint)))
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ReplyCache:
+    """
+    Memory tier: OrderedDict LRU bounded by max_entries, entries expire after ttl.
+    Disk tier (db_path): SQLite table checked on a memory miss and written on put,
+    so other sessions and processes reuse the same replies.
+    """
+
+    def __init__(self, max_entries=REPLY_CACHE_SIZE, ttl=REPLY_TTL, db_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = os.path.abspath(db_path) if db_path else None
+        self._mem = OrderedDict()  # key -> (expires_at, reply)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = self.disk_hits = self.misses = 0
+
+    def _db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS replies (key TEXT PRIMARY KEY, expires REAL NOT NULL, reply TEXT NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key, expires, reply):
+        with self._lock:
+            self._mem[key] = (expires, reply)
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                if hit[0] > now:
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return hit[1]
+                del self._mem[key]
+        if self.db_path:
+            try:
+                row = self._db().execute("SELECT expires, reply FROM replies WHERE key=? AND expires>?", (key, now)).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row:
+                self._remember(key, row[0], row[1])
+                with self._lock:
+                    self.disk_hits += 1
+                return row[1]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, reply):
+        expires = time.time() + self.ttl
+        self._remember(key, expires, reply)
+        if self.db_path:
+            try:
+                conn = self._db()
+                conn.execute("INSERT OR REPLACE INTO replies VALUES (?, ?, ?)", (key, expires, reply))
+                # keep the table from growing forever: sweep expired rows now and then
+                if random.random() < 0.01:
+                    conn.execute("DELETE FROM replies WHERE expires<=?", (time.time(),))
+            except sqlite3.Error:
+                pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {"entries": len(self._mem), "hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0}
+
+
+_reply_caches = {}
+_reply_caches_lock = threading.Lock()
+
+
+def get_reply_cache(db_path=None, **kwargs):
+    # one cache per disk file per process, shared by every session
+    with _reply_caches_lock:
+        key = os.path.abspath(db_path) if db_path else None
+        if key not in _reply_caches:
+            _reply_caches[key] = ReplyCache(db_path=db_path, **kwargs)
+        return _reply_caches[key]
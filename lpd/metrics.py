@@ -0,0 +1,199 @@
+"""
+Lightweight timings and counters for the dashboard.
+
+    with timer("chat.render"): ...      # or @timer("state.save") on a function
+    count("reruns")
+
+One registry per process, shared by every session, like the other caches.
+A timer keeps its total count, sum and max plus the last WINDOW durations in
+a NumPy ring buffer, so p50/p95 cost nothing until someone looks at them
+(the Diagnostics page or an export). Exports are JSON and the Prometheus
+text format; with LPD_METRICS_FILE set, the Prometheus text is also written
+to that file every DUMP_INTERVAL seconds for a node_exporter textfile
+collector. LPD_METRICS=0 turns timers and counters into no-ops.
+
+For sizing hosts, sessions report their estimated state bytes on every rerun
+(track_session); snapshots add the process RSS, the sessions seen in the last
+SESSION_TTL seconds and the RSS per session as gauges.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import threading
+from contextlib import ContextDecorator
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows: no RSS reading
+    resource = None
+
+WINDOW = 2048
+DUMP_INTERVAL = 15.0
+PREFIX = "lpd"
+ENABLED = os.environ.get("LPD_METRICS", "1") != "0"
+QUANTILES = (0.5, 0.95)
+SESSION_TTL = 600.0  # a session that hasn't rerun for this long no longer counts as active
+
+
+def rss_bytes():
+    """Resident set size of this process; the peak where /proc is missing, None if unknown."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB elsewhere
+
+
+class _Series:
+    __slots__ = ("values", "n", "total", "max")
+
+    def __init__(self):
+        self.values = np.zeros(WINDOW)
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.values[self.n % WINDOW] = seconds
+        self.n += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timers = {}
+        self._counters = {}
+        self._sessions = {}  # session id -> (last seen, estimated state bytes)
+        self._last_dump = 0.0
+        self.started = time.time()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            series = self._timers.get(name)
+            if series is None:
+                series = self._timers[name] = _Series()
+            series.add(seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def track_session(self, session_id, state_bytes):
+        with self._lock:
+            self._sessions[session_id] = (time.monotonic(), int(state_bytes))
+
+    def memory(self):
+        """Process RSS, sessions active in the last SESSION_TTL, their summed state estimate and RSS per session."""
+        now = time.monotonic()
+        with self._lock:
+            for sid in [sid for sid, (seen, _) in self._sessions.items() if now - seen > SESSION_TTL]:
+                del self._sessions[sid]
+            n, state_bytes = len(self._sessions), sum(b for _, b in self._sessions.values())
+        rss = rss_bytes()
+        return {"process_rss_bytes": rss, "active_sessions": n, "session_state_bytes": state_bytes,
+                "rss_bytes_per_session": rss // n if rss is not None and n else None}
+
+    def reset(self):
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        """{"timers": {name: {count, sum, mean, max, p50, p95}} (seconds), "counters": {name: n}, "since": ts}."""
+        with self._lock:
+            timers = {name: (s.values[:min(s.n, WINDOW)].copy(), s.n, s.total, s.max) for name, s in self._timers.items()}
+            counters = dict(self._counters)
+        out = {}
+        for name, (window, n, total, peak) in sorted(timers.items()):
+            qs = np.quantile(window, QUANTILES) if len(window) else [0.0] * len(QUANTILES)
+            out[name] = {"count": n, "sum": total, "mean": total / n if n else 0.0, "max": peak,
+                         **{f"p{int(q * 100)}": float(v) for q, v in zip(QUANTILES, qs)}}
+        return {"timers": out, "counters": dict(sorted(counters.items())), "memory": self.memory(), "since": self.started}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        snap = self.snapshot()
+        lines = [f"# HELP {PREFIX}_section_seconds Wall time of dashboard sections (quantiles over the last {WINDOW} runs).",
+                 f"# TYPE {PREFIX}_section_seconds summary"]
+        for name, t in snap["timers"].items():
+            label = _label(name)
+            for q in QUANTILES:
+                lines.append(f'{PREFIX}_section_seconds{{section="{label}",quantile="{q}"}} {t[f"p{int(q * 100)}"]:.6g}')
+            lines.append(f'{PREFIX}_section_seconds_sum{{section="{label}"}} {t["sum"]:.6g}')
+            lines.append(f'{PREFIX}_section_seconds_count{{section="{label}"}} {t["count"]}')
+        for name, n in snap["counters"].items():
+            metric = f"{PREFIX}_{_metric_name(name)}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {n}"]
+        for name, value in snap["memory"].items():
+            if value is not None:
+                lines += [f"# TYPE {PREFIX}_{name} gauge", f"{PREFIX}_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def maybe_dump(self, path, every=DUMP_INTERVAL):
+        """Writes the Prometheus text to path if the last write is older than `every` seconds."""
+        now = time.monotonic()
+        with self._lock:
+            if not path or now - self._last_dump < every:
+                return False
+            self._last_dump = now
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)  # scrapers never see a half-written file
+        return True
+
+
+def _metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name).strip("_").lower()
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = Registry()
+
+
+class timer(ContextDecorator):
+    """Times a block or, as a decorator, every call of a function."""
+
+    def __init__(self, name, registry=None):
+        self.name = name
+        self.registry = registry or REGISTRY
+        self._t0 = None
+
+    def _recreate_cm(self):
+        # a fresh instance per call, so recursive or concurrent calls don't share a start time
+        return type(self)(self.name, self.registry)
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if ENABLED:
+            self.registry.observe(self.name, time.perf_counter() - self._t0)
+        return False
+
+
+def observe(name, seconds):
+    if ENABLED:
+        REGISTRY.observe(name, seconds)
+
+
+def count(name, n=1):
+    if ENABLED:
+        REGISTRY.count(name, n)
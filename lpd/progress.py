@@ -0,0 +1,169 @@
+"""
+Event log of course progress changes.
+
+Every completion change (slider, Add Course form, ...) is one fixed-width
+record in a NumPy structured array: epoch seconds, a 64-bit hash of the
+course name, the new completion and the change from the previous value. The
+log is persisted per user next to the state as the raw records, appended
+with O_APPEND and read back incrementally (recordlog.RecordLog), so several
+processes can share it.
+
+Aggregates are vectorized over the columns and folded in incrementally as
+new events arrive: per-day and per-(course, day) changes, and the latest
+completion of every course. Completion levels at a past point in time (the
+weekly donuts) are computed once per boundary from the event prefix before
+it, and kept until an event older than the boundary shows up.
+"""
+
+import time
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from store import UserRegistry
+from recordlog import RecordLog
+
+EVENT_DTYPE = np.dtype([("ts", "<i8"), ("course", "<i8"), ("completion", "i1"), ("delta", "i1")])
+PROGRESS_FILE = "cse_dashboard_state.progress.bin"
+DAY = 86400
+
+
+def course_id(name):
+    digest = hashlib.blake2b(str(name).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def week_boundaries(weeks=4, now=None):
+    """[(iso week number, end ts)] oldest first; the current week ends now."""
+    now = now or time.time()
+    today = datetime.fromtimestamp(now, timezone.utc)
+    monday = (today - timedelta(days=today.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    out = [(today.isocalendar()[1], int(now))]
+    for i in range(1, weeks):
+        end = monday - timedelta(days=7 * (i - 1))
+        out.append(((end - timedelta(days=1)).isocalendar()[1], int(end.timestamp())))
+    return out[::-1]
+
+
+class ProgressLog(RecordLog):
+    def __init__(self, path=None):
+        super().__init__(path, EVENT_DTYPE)
+        self._newest = 0
+        self._known = set()
+        self._daily = {}         # day -> net completion change (all courses)
+        self._course_daily = {}  # (course, day) -> net change
+        self._latest = {}        # course -> completion after its last event
+        self._at = {}            # boundary ts -> {course: completion} as of that time
+
+    # ---- reading ----
+    @property
+    def events(self):
+        return self.records
+
+    @staticmethod
+    def _last_per_course(ev):
+        # the last record of each course (records are in append order)
+        uc, idx = np.unique(ev["course"][::-1], return_index=True)
+        return dict(zip(uc.tolist(), ev["completion"][::-1][idx].tolist()))
+
+    def _fold(self, new):
+        # incremental aggregates: only the new slice is grouped
+        if len(new):
+            self._newest = max(self._newest, int(new["ts"].max()))
+            oldest = int(new["ts"].min())
+            # snapshots at or after the oldest new event are no longer complete
+            self._at = {b: snap for b, snap in self._at.items() if b < oldest}
+        latest = self._last_per_course(new)
+        self._known.update(latest)
+        self._latest.update(latest)
+        changed = new[new["delta"] != 0]
+        if not len(changed):
+            return
+        days = changed["ts"] // DAY
+        deltas = changed["delta"].astype(np.int64)
+        ud, inv = np.unique(days, return_inverse=True)
+        for d, v in zip(ud.tolist(), np.bincount(inv.ravel(), weights=deltas).tolist()):
+            self._daily[d] = self._daily.get(d, 0) + int(v)
+        # (course, day) pairs as one int64 key: dense course code * day span + day offset
+        uc, code = np.unique(changed["course"], return_inverse=True)
+        d0 = int(ud[0])
+        span = int(ud[-1]) - d0 + 1
+        uk, inv = np.unique(code.ravel().astype(np.int64) * span + (days - d0), return_inverse=True)
+        sums = np.bincount(inv.ravel(), weights=deltas)
+        for c, d, v in zip(uc[uk // span].tolist(), (uk % span + d0).tolist(), sums.tolist()):
+            self._course_daily[(c, d)] = self._course_daily.get((c, d), 0) + int(v)
+
+    # ---- writing ----
+    def record_many(self, changes, ts=None):
+        """changes: [(course name, new completion, previous completion or None)]; None = baseline, no change."""
+        if not changes:
+            return 0
+        rec = np.empty(len(changes), dtype=EVENT_DTYPE)
+        rec["ts"] = int(ts if ts is not None else time.time())
+        rec["course"] = [course_id(name) for name, _, _ in changes]
+        rec["completion"] = [int(new) for _, new, _ in changes]
+        rec["delta"] = [0 if prev is None else int(new) - int(prev) for _, new, prev in changes]
+        return self.append(rec)
+
+    def record(self, course, completion, previous=None, ts=None):
+        return self.record_many([(course, completion, previous)], ts=ts)
+
+    def ensure_baseline(self, courses):
+        """Records the current completion of courses the log has never seen (delta 0)."""
+        with self._lock:
+            self.refresh()
+            missing = [(name, comp, None) for name, comp in courses if course_id(name) not in self._known]
+        return self.record_many(missing)
+
+    # ---- aggregates ----
+    def _snapshot(self, boundary):
+        snap = self._at.get(boundary)
+        if snap is None:
+            ev = self.events
+            snap = self._last_per_course(ev[ev["ts"] <= boundary])
+            self._at[boundary] = snap
+        return snap
+
+    def levels_at(self, names, boundaries):
+        """Completion of each course at each boundary ts: float array [courses x boundaries], NaN = no data yet."""
+        ids = [course_id(n) for n in names]
+        with self._lock:
+            self.refresh()
+            out = np.full((len(ids), len(boundaries)), np.nan)
+            for j, b in enumerate(boundaries):
+                snap = self._latest if b >= self._newest else self._snapshot(int(b))
+                out[:, j] = [snap.get(c, np.nan) for c in ids]
+        return out
+
+    def overall_at(self, names, boundaries):
+        """Mean completion over the courses known at each boundary; None where none was known yet."""
+        levels = self.levels_at(names, boundaries)
+        known = ~np.isnan(levels)
+        counts = known.sum(axis=0)
+        sums = np.where(known, levels, 0).sum(axis=0)
+        return [float(s / c) if c else None for s, c in zip(sums, counts)]
+
+    def daily_changes(self, days=28, now=None):
+        """Net completion change per day for the last `days` days, oldest first: (day start ts array, values)."""
+        today = int(now or time.time()) // DAY
+        with self._lock:
+            self.refresh()
+            vals = np.array([self._daily.get(d, 0) for d in range(today - days + 1, today + 1)], dtype=np.int64)
+        return np.arange(today - days + 1, today + 1, dtype=np.int64) * DAY, vals
+
+    def course_change(self, name, days=7, now=None):
+        today = int(now or time.time()) // DAY
+        c = course_id(name)
+        with self._lock:
+            return sum(self._course_daily.get((c, d), 0) for d in range(today - days + 1, today + 1))
+
+    def stats(self):
+        return {"events": self._n, "bytes": self._n * EVENT_DTYPE.itemsize, "courses": len(self._known)}
+
+
+_logs = UserRegistry(ProgressLog)
+
+
+def get_progress_log(user, path=PROGRESS_FILE):
+    return _logs.get(path, user)
@@ -0,0 +1,219 @@
+"""
+Quiz engine: per-course question banks and a columnar score history.
+
+A bank is built once per course per process: the course's own questions
+(looked up by syllabus.course_key) followed by the general ones, with one
+precompiled pattern per question that matches any accepted answer as whole
+words of the normalized reply ("O(log n)", "log n" and "logarithmic" can all
+be accepted). A quiz is just the sampled question indices, so generating one
+never copies the bank.
+
+Attempts go to a per-user append-only file of fixed-width records (epoch
+seconds, course hash, score, question count), read incrementally like the
+progress log (recordlog.RecordLog). Per-course analytics (attempts, mean, trend,
+percentile of the latest attempt) are computed over the columns with
+bincount and cached until the next attempt arrives.
+"""
+
+import re
+import time
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from store import UserRegistry
+from progress import course_id
+from syllabus import course_key
+from recordlog import RecordLog
+
+SCORE_DTYPE = np.dtype([("ts", "<i8"), ("course", "<i8"), ("score", "i1"), ("total", "i1")])
+SCORES_FILE = "cse_dashboard_state.quiz.bin"
+TREND_WINDOW = 10  # attempts per course the trend is fitted over
+
+# course key -> [(question, accepted answers)]; "{course}" is replaced with the course name
+BANKS = {
+    "python": [
+        ("In Python, which keyword defines a function?", ["def"]),
+        ("Which built-in returns the number of items in a list?", ["len", "len()"]),
+        ("What is the immutable counterpart of a list?", ["tuple"]),
+        ("Which keyword starts an exception handler block?", ["try"]),
+        ("Which statement turns a function into a generator?", ["yield"]),
+        ("Which data type maps keys to values?", ["dict", "dictionary"]),
+    ],
+    "c++": [
+        ("Which keyword allocates an object on the heap?", ["new"]),
+        ("Which STL container is a dynamic array?", ["vector", "std::vector"]),
+        ("What is a function called that has the same name as its class and runs on creation?", ["constructor"]),
+        ("Which keyword makes a member function overridable at run time?", ["virtual"]),
+        ("Which smart pointer has exactly one owner?", ["unique_ptr", "std::unique_ptr"]),
+    ],
+    "c": [
+        ("Which function allocates memory on the heap?", ["malloc", "calloc"]),
+        ("Which operator gives the address of a variable?", ["&", "ampersand", "address of"]),
+        ("Which function releases heap memory?", ["free"]),
+        ("Which header declares printf?", ["stdio.h", "stdio"]),
+    ],
+    "web development": [
+        ("Which HTTP method is used to submit form data that changes state?", ["post"]),
+        ("Which language styles HTML pages?", ["css"]),
+        ("What status code means 'Not Found'?", ["404"]),
+    ],
+    "ai": [
+        ("Which search algorithm uses a heuristic plus path cost?", ["a*", "a star", "astar"]),
+        ("What is an agent's mapping from percepts to actions called?", ["policy", "agent function"]),
+    ],
+    "machine learning": [
+        ("What is it called when a model fits training data but fails on new data?", ["overfitting", "overfit"]),
+        ("Which algorithm minimizes a loss by following the negative gradient?", ["gradient descent", "sgd"]),
+        ("Which metric is the harmonic mean of precision and recall?", ["f1", "f1 score", "f score"]),
+    ],
+    "data science": [
+        ("Which pandas method groups rows by a column?", ["groupby"]),
+        ("Which measure of central tendency is robust to outliers?", ["median"]),
+    ],
+    "cybersecurity": [
+        ("Which attack injects code through unsanitized database queries?", ["sql injection", "sqli"]),
+        ("What does the 'S' in HTTPS stand for?", ["secure"]),
+    ],
+    None: [  # general questions, part of every bank
+        ("What is a common data structure used in {course} to implement FIFO?", ["queue"]),
+        ("What complexity (big-O) is average-case for binary search?", ["logarithmic", "log n"]),
+        ("Which data structure follows last-in, first-out order?", ["stack"]),
+        ("What is a function that calls itself called?", ["recursive", "recursion"]),
+        ("What is the worst-case complexity of quicksort?", ["quadratic", "n^2", "n squared"]),
+    ],
+}
+
+_NORMALIZE_RE = re.compile(r"[^\w+#*&]+")
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize_answer(text):
+    """Lowercase, punctuation to single spaces ("O(log n)!" -> "o log n", "std::vector" -> "std vector")."""
+    return _SPACES_RE.sub(" ", _NORMALIZE_RE.sub(" ", str(text or "").lower())).strip()
+
+
+def _answer_pattern(answers):
+    alts = sorted({normalize_answer(a) for a in answers if normalize_answer(a)}, key=len, reverse=True)
+    # whole words of the normalized reply: "def" matches "def" and "the def keyword", not "default"
+    return re.compile(r"(?<![\w+#*&])(?:" + "|".join(re.escape(a) for a in alts) + r")(?![\w+#*&])")
+
+
+class QuestionBank:
+    def __init__(self, course, questions):
+        self.course = course
+        self.questions = tuple(q.replace("{course}", course) for q, _ in questions)
+        self.answers = tuple(a[0] for _, a in questions)  # the answer shown after submitting
+        self._patterns = tuple(_answer_pattern(a) for _, a in questions)
+
+    def __len__(self):
+        return len(self.questions)
+
+    def sample(self, n=3, rng=None):
+        """n distinct question indices (fewer if the bank is smaller)."""
+        rng = rng or np.random.default_rng()
+        return rng.choice(len(self.questions), size=min(n, len(self.questions)), replace=False).tolist()
+
+    def check(self, index, reply):
+        return bool(reply) and self._patterns[index].search(normalize_answer(reply)) is not None
+
+    def score(self, indices, replies):
+        return sum(self.check(i, r) for i, r in zip(indices, replies))
+
+
+_banks = {}
+_banks_lock = threading.Lock()
+
+
+def get_bank(course):
+    # built once per course per process; the general questions follow the course's own
+    with _banks_lock:
+        bank = _banks.get(course)
+        if bank is None:
+            bank = _banks[course] = QuestionBank(course, BANKS.get(course_key(course), []) + BANKS[None])
+        return bank
+
+
+class ScoreLog(RecordLog):
+    def __init__(self, path=None):
+        super().__init__(path, SCORE_DTYPE)
+        self._stats = None  # (event count, {course id: stats}) for the last computed analytics
+
+    @property
+    def events(self):
+        return self.records
+
+    def record_many(self, attempts):
+        """attempts: [(course name, score, total, ts or None)]."""
+        if not attempts:
+            return 0
+        rec = np.empty(len(attempts), dtype=SCORE_DTYPE)
+        now = int(time.time())
+        rec["ts"] = [int(ts) if ts is not None else now for _, _, _, ts in attempts]
+        rec["course"] = [course_id(name) for name, _, _, _ in attempts]
+        rec["score"] = [int(s) for _, s, _, _ in attempts]
+        rec["total"] = [int(t) for _, _, t, _ in attempts]
+        return self.append(rec)
+
+    def record(self, course, score, total, ts=None):
+        return self.record_many([(course, score, total, ts)])
+
+    def import_legacy(self, quiz_scores, default_total=3):
+        """Moves the old {course: [{"score", "ts"}]} dict into the log, skipping attempts it already holds."""
+        self.refresh()
+        seen = set(zip(self.events["course"].tolist(), self.events["ts"].tolist()))
+        attempts = []
+        for course, rows in (quiz_scores or {}).items():
+            for row in rows or ():
+                ts = int(datetime.fromisoformat(str(row["ts"])).timestamp()) if row.get("ts") else 0
+                if (course_id(course), ts) not in seen:
+                    attempts.append((course, row.get("score", 0), row.get("total", default_total), ts))
+        return self.record_many(attempts)
+
+    def course_stats(self):
+        """{course id: {"attempts", "mean", "trend", "last", "percentile"}}, percentages 0-100, cached per attempt count."""
+        self.refresh()
+        with self._lock:
+            if self._stats is not None and self._stats[0] == self._n:
+                return self._stats[1]
+            stats = _compute_stats(self.events)
+            self._stats = (self._n, stats)
+            return stats
+
+    def stats(self):
+        return {"attempts": self._n, "bytes": self._n * SCORE_DTYPE.itemsize}
+
+
+def _compute_stats(ev):
+    if not len(ev):
+        return {}
+    # attempts grouped by course, oldest first within a course
+    order = np.lexsort((ev["ts"], ev["course"]))
+    ev = ev[order]
+    pct = ev["score"].astype(float) * 100 / np.maximum(ev["total"], 1)
+    courses, code, counts = np.unique(ev["course"], return_inverse=True, return_counts=True)
+    code = code.ravel()
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    rank = np.arange(len(ev)) - starts[code]  # attempt number within its course
+    mean = np.bincount(code, weights=pct) / counts
+    last = pct[starts + counts - 1]
+    # share of a course's attempts scoring at or below its latest one
+    percentile = np.bincount(code, weights=pct <= last[code]) / counts * 100
+    # least-squares slope (points per attempt) over each course's last TREND_WINDOW attempts
+    recent = rank >= (counts - TREND_WINDOW)[code]
+    x, y, c = rank[recent].astype(float), pct[recent], code[recent]
+    n = np.bincount(c, minlength=len(courses)).astype(float)
+    sx, sy = np.bincount(c, x, len(courses)), np.bincount(c, y, len(courses))
+    sxx, sxy = np.bincount(c, x * x, len(courses)), np.bincount(c, x * y, len(courses))
+    denom = n * sxx - sx * sx
+    trend = np.divide(n * sxy - sx * sy, denom, out=np.zeros(len(courses)), where=denom > 0)
+    return {int(cid): {"attempts": int(k), "mean": float(m), "trend": float(t), "last": float(l), "percentile": float(p)}
+            for cid, k, m, t, l, p in zip(courses.tolist(), counts, mean, trend, last, percentile)}
+
+
+_logs = UserRegistry(ScoreLog)
+
+
+def get_score_log(user, path=SCORES_FILE):
+    return _logs.get(path, user)
@@ -0,0 +1,87 @@
+"""
+Append-only logs of fixed-width records, shared by the progress log
+(progress.py), the quiz score log (quiz.py) and the history archive index
+(archive.py).
+
+Records are one NumPy structured dtype. The file holds the raw records,
+appended with O_APPEND (one os.write per batch) and read back with
+np.fromfile, so several processes can share it: a process only ever reads
+the bytes it has not seen yet, and a record still being written (a partial
+last record) is left for the next refresh. In memory the records sit in a
+growable array; subclasses fold each new slice into their aggregates in
+_fold.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+
+class RecordLog:
+    def __init__(self, path, dtype):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.RLock()
+        self._records = np.empty(0, dtype=self.dtype)
+        self._n = 0      # records in use
+        self._bytes = 0  # file bytes read so far
+
+    @property
+    def records(self):
+        return self._records[:self._n]
+
+    def __len__(self):
+        return self._n
+
+    def refresh(self):
+        """Reads records appended to the file (by any process) since the last refresh; returns how many."""
+        if not self.path:
+            return 0
+        with self._lock:
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                return 0
+            size -= size % self.dtype.itemsize  # ignore a record still being written
+            if size <= self._bytes:
+                return 0
+            with open(self.path, "rb") as f:
+                f.seek(self._bytes)
+                new = np.fromfile(f, dtype=self.dtype, count=(size - self._bytes) // self.dtype.itemsize)
+            self._bytes += new.nbytes
+            return self._extend(new)
+
+    def append(self, rec):
+        """Writes records (an array of self.dtype) in one append, then reads them back with anything newer."""
+        if not len(rec):
+            return 0
+        with self._lock:
+            if self.path:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, rec.tobytes())
+                finally:
+                    os.close(fd)
+                self.refresh()
+            else:
+                self._extend(rec)
+        return len(rec)
+
+    def _extend(self, new):
+        # under self._lock; returns how many records were kept
+        if self._n + len(new) > len(self._records):
+            grown = np.empty(max(2 * len(self._records), self._n + len(new), 64), dtype=self.dtype)
+            grown[:self._n] = self._records[:self._n]
+            self._records = grown
+        self._records[self._n:self._n + len(new)] = new
+        self._n += len(new)
+        self._fold(new)
+        return len(new)
+
+    def _fold(self, new):
+        pass
+
+    def stats(self):
+        return {"records": self._n, "bytes": self._n * self.dtype.itemsize}
@@ -0,0 +1,306 @@
+"""
+Warm interpreter pool for the Code Runner.
+
+Worker processes are started ahead of time and wait for snippets on stdin.
+A worker never runs user code itself: it forks a child per snippet, so every
+run starts from the same clean, already-initialised interpreter for the cost
+of a fork. The child gets fresh CPU-time and address-space limits from
+`resource`, captured output is capped, and the wall-clock timeout kills the
+child (not the worker). Results come back as one JSON line on a separate
+pipe, so nothing a snippet prints can corrupt the protocol. Workers are
+recycled after `max_jobs_per_worker` snippets and replaced in the background.
+
+Requests beyond the pool wait in a bounded FIFO queue; the pool keeps
+latency / queue-wait / throughput figures for the page to show.
+
+    python sandbox.py --bench [runs] [threads]   compare cold subprocess vs warm pool
+"""
+
+import io
+import os
+import sys
+import json
+import math
+import time
+import queue
+import select
+import signal
+import atexit
+import threading
+import subprocess
+import traceback
+from collections import deque
+from contextlib import redirect_stdout, redirect_stderr
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, the pool is not used there
+    resource = None
+
+POOL_SIZE = 2
+MAX_JOBS_PER_WORKER = 200
+MAX_QUEUE = 16
+CPU_SECONDS = 5
+MEMORY_MB = 512
+MAX_OUTPUT = 64 * 1024
+
+
+def pool_supported():
+    return os.name == "posix" and resource is not None
+
+
+# ------------------ Worker side ------------------
+class _Capped(io.TextIOBase):
+    def __init__(self, limit):
+        self.limit = limit
+        self.parts = []
+        self.size = 0
+        self.truncated = False
+
+    def writable(self):
+        return True
+
+    def write(self, s):
+        room = self.limit - self.size
+        if room <= 0:
+            self.truncated = self.truncated or bool(s)
+            return len(s)
+        if len(s) > room:
+            self.truncated = True
+        self.parts.append(s[:room])
+        self.size += min(len(s), room)
+        return len(s)
+
+    def getvalue(self):
+        return "".join(self.parts)
+
+
+def _execute(code, max_output):
+    stdout, stderr = _Capped(max_output), _Capped(max_output)
+    with redirect_stdout(stdout), redirect_stderr(stderr):
+        try:
+            exec(compile(code, "<snippet>", "exec"), {"__name__": "__main__"})
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                print(f"SystemExit: {e.code}", file=sys.stderr)
+        except BaseException:
+            etype, value, tb = sys.exc_info()
+            traceback.print_exception(etype, value, tb.tb_next)  # hide this frame
+    return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(),
+            "truncated": stdout.truncated or stderr.truncated, "timed_out": False}
+
+
+def _run_forked(req, result_fd, memory_mb, max_output):
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # child: no access to the request/result channels, fresh limits, report on `w`
+        try:
+            os.close(r)
+            os.close(result_fd)
+            devnull = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(devnull, 0)
+            if resource is not None:
+                limit = memory_mb * 1024 * 1024
+                resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+                resource.setrlimit(resource.RLIMIT_CPU, (req["cpu"], req["cpu"] + 1))
+            res = _execute(req["code"], max_output)
+            with os.fdopen(w, "w", encoding="utf-8") as f:
+                f.write(json.dumps(res))
+        finally:
+            os._exit(0)
+    os.close(w)
+    with os.fdopen(r, "r", encoding="utf-8") as f:
+        ready, _, _ = select.select([f], [], [], req["timeout"])
+        if not ready:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            return {"stdout": "", "stderr": "Execution timed out.", "timed_out": True, "truncated": False}
+        data = f.read()
+    _, status = os.waitpid(pid, 0)
+    if data:
+        return json.loads(data)
+    if os.WIFSIGNALED(status) and os.WTERMSIG(status) in (signal.SIGXCPU, signal.SIGKILL):
+        msg = "CPU time limit exceeded."
+    else:
+        msg = f"Snippet process exited abnormally (status {status})."
+    return {"stdout": "", "stderr": msg, "timed_out": False, "truncated": False}
+
+
+def _worker_main(result_fd, memory_mb, max_output):
+    out = os.fdopen(result_fd, "w", encoding="utf-8")
+    for line in sys.stdin:
+        res = _run_forked(json.loads(line), result_fd, memory_mb, max_output)
+        out.write(json.dumps(res) + "\n")
+        out.flush()
+
+
+# ------------------ Parent side ------------------
+class _Worker:
+    def __init__(self, memory_mb, max_output):
+        r, w = os.pipe()
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker", str(w), str(memory_mb), str(max_output)],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            pass_fds=(w,), text=True, encoding="utf-8",
+        )
+        os.close(w)
+        self.results = os.fdopen(r, "r", encoding="utf-8")
+        self.jobs = 0
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def run(self, code, timeout, cpu):
+        self.jobs += 1
+        self.proc.stdin.write(json.dumps({"code": code, "cpu": cpu, "timeout": timeout}) + "\n")
+        self.proc.stdin.flush()
+        # the worker enforces `timeout` on its child; this only guards against a stuck worker
+        ready, _, _ = select.select([self.results], [], [], timeout + 2)
+        line = self.results.readline() if ready else ""
+        if not line:
+            self.kill()
+            return {"stdout": "", "stderr": "Code runner worker failed.", "timed_out": not ready, "truncated": False}
+        return json.loads(line)
+
+    def kill(self):
+        try:
+            self.proc.kill()
+            self.proc.wait(timeout=2)
+        except Exception:
+            pass
+        for f in (self.proc.stdin, self.results):
+            try:
+                f.close()
+            except Exception:
+                pass
+
+
+class SandboxPool:
+    def __init__(self, size=POOL_SIZE, max_jobs_per_worker=MAX_JOBS_PER_WORKER, max_queue=MAX_QUEUE,
+                 cpu_seconds=CPU_SECONDS, memory_mb=MEMORY_MB, max_output=MAX_OUTPUT):
+        self.size = size
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.max_output = max_output
+        self._idle = queue.Queue()  # waiters are woken in FIFO order
+        self._admit = threading.BoundedSemaphore(size + max_queue)
+        self._lock = threading.Lock()
+        self._runs = deque(maxlen=500)  # (finished_at, latency, wait)
+        self._rejected = 0
+        self._closed = False
+        for _ in range(size):
+            self._spawn_async()
+        atexit.register(self.close)
+
+    def _spawn(self):
+        if self._closed:
+            return
+        try:
+            self._idle.put(_Worker(self.memory_mb, self.max_output))
+        except Exception:
+            # keep the pool size constant even if a spawn fails transiently
+            time.sleep(1)
+            threading.Thread(target=self._spawn, daemon=True).start()
+
+    def _spawn_async(self):
+        threading.Thread(target=self._spawn, daemon=True, name="lpd-sandbox-spawn").start()
+
+    def run(self, code, timeout=5.0):
+        """Returns dict(stdout, stderr, timed_out, truncated, latency, wait); latency includes the queue wait."""
+        t0 = time.perf_counter()
+        if not self._admit.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            return {"stdout": "", "stderr": "Code runner is busy, try again shortly.", "timed_out": False,
+                    "truncated": False, "latency": 0.0, "wait": 0.0}
+        try:
+            try:
+                worker = self._idle.get(timeout=timeout)
+            except queue.Empty:
+                return {"stdout": "", "stderr": "Timed out waiting for a free code runner.", "timed_out": True,
+                        "truncated": False, "latency": time.perf_counter() - t0, "wait": time.perf_counter() - t0}
+            wait = time.perf_counter() - t0
+            try:
+                res = worker.run(code, timeout, min(self.cpu_seconds, math.ceil(timeout)))
+            finally:
+                if worker.alive() and worker.jobs < self.max_jobs_per_worker:
+                    self._idle.put(worker)
+                else:
+                    worker.kill()
+                    self._spawn_async()
+        finally:
+            self._admit.release()
+        res["wait"] = wait
+        res["latency"] = time.perf_counter() - t0
+        with self._lock:
+            self._runs.append((time.time(), res["latency"], wait))
+        return res
+
+    def stats(self, window=60.0):
+        with self._lock:
+            runs = list(self._runs)
+            rejected = self._rejected
+        now = time.time()
+        recent = [r for r in runs if now - r[0] <= window]
+        lat = sorted(r[1] for r in runs)
+        waits = sorted(r[2] for r in runs)
+
+        def pct(xs, p):
+            return xs[min(len(xs) - 1, int(p * len(xs)))] if xs else None
+
+        return {"runs": len(runs), "p50": pct(lat, 0.5), "p95": pct(lat, 0.95), "wait_p95": pct(waits, 0.95),
+                "throughput": len(recent) / window, "idle": self._idle.qsize(), "rejected": rejected}
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                break
+
+
+def run_cold(code, timeout=5):
+    # the old path: one fresh interpreter per run
+    try:
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=timeout)
+        return {"stdout": proc.stdout, "stderr": proc.stderr, "timed_out": False, "truncated": False}
+    except subprocess.TimeoutExpired:
+        return {"stdout": "", "stderr": "Execution timed out.", "timed_out": True, "truncated": False}
+
+
+def _bench(runs=40, threads=4):
+    from concurrent.futures import ThreadPoolExecutor
+    code = "print(sum(range(10000)))"
+
+    def measure(fn):
+        lat = []
+
+        def one(_):
+            t = time.perf_counter()
+            fn(code)
+            lat.append(time.perf_counter() - t)
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(threads) as ex:
+            list(ex.map(one, range(runs)))
+        total = time.perf_counter() - t0
+        lat.sort()
+        return lat[len(lat) // 2] * 1000, lat[int(len(lat) * 0.95) - 1] * 1000, runs / total
+
+    print(f"{runs} runs, {threads} concurrent clients")
+    print("cold subprocess  p50 %.1f ms  p95 %.1f ms  %.1f runs/s" % measure(run_cold))
+    pool = SandboxPool(size=threads)
+    time.sleep(1.0)  # let the pool warm up
+    print("warm pool        p50 %.1f ms  p95 %.1f ms  %.1f runs/s" % measure(pool.run))
+    pool.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        _worker_main(int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "--bench":
+        _bench(*(int(a) for a in sys.argv[2:4]))
+    else:
+        print(__doc__)
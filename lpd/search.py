@@ -0,0 +1,245 @@
+"""
+Full-text search over notes, Spectorial entries and chat history.
+
+An inverted index (term -> {doc: term frequency}) is kept per user and only
+ever fed the entries appended since the last sync, so adding a note costs
+the tokens of that note and a query never touches entry bodies. Results are
+ranked with BM25; a query term ending in "*" (and, for search-as-you-type,
+the last term) also matches every indexed term with that prefix, found by
+bisecting a sorted vocabulary.
+
+The index is persisted next to the user's state (see store.user_state_path)
+as an append-only JSONL log with one line per indexed entry (its term
+counts), so a sync writes only the new entries and loading replays the log
+without tokenizing anything. A line is applied only if it is the next
+position of its source, which makes replay idempotent when several processes
+append the same entries. Anything the log is missing is re-indexed from the
+state on the next sync.
+
+Sessions of one user share the index, so each sync carries the journal seq
+of the state it comes from (store.py) and sessions behind the index are
+not synced from.
+
+Positions are absolute: once the oldest entries of a list move to the cold
+archive (see archive.py), the list in the state starts at its "hot start"
+and sync/search take the archived ranges into account.
+"""
+
+import os
+import re
+import json
+import math
+import heapq
+import hashlib
+import threading
+from bisect import bisect_left, insort
+
+from store import UserRegistry
+
+# store key in the session state -> short label shown with hits
+SOURCES = {"notes": "Note", "spectorial_entries": "Spectorial", "chat_history": "Chat"}
+INDEX_FILE = "cse_dashboard_state.index.jsonl"
+INDEX_VERSION = 1
+MAX_PREFIX_TERMS = 64
+K1 = 1.2
+B = 0.75
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+def entry_text(source, entry):
+    if source == "notes":
+        # titles count twice: a hit in the title is worth more than one in the body
+        title = entry.get("title", "")
+        return f"{title} {title} {entry.get('body', '')}"
+    if source == "spectorial_entries":
+        return f"{entry.get('prompt', '')} {entry.get('entry', '')}"
+    return entry.get("message", "") or ""
+
+
+def _entry_digest(entry):
+    if hasattr(entry, "to_record"):
+        entry = entry.to_record()
+    raw = json.dumps(entry, sort_keys=True, default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class SearchIndex:
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.seq = 0  # newest persisted state (journal seq) any session synced from
+        self._reset()
+        if path:
+            self._load()
+
+    def _reset(self):
+        self.postings = {}   # term -> {doc_id: tf}
+        self.vocab = []      # sorted terms, for prefix lookups
+        self.docs = []       # doc_id -> (source, position, length)
+        self.total_len = 0
+        self._norms = None   # per-doc BM25 length normalisation, rebuilt when docs change
+        # source -> [entries indexed, digest of the last one]; a mismatch means the list was rewritten
+        self.synced = {s: [0, None] for s in SOURCES}
+
+    # ---- building ----
+    def _add(self, source, pos, length, counts, keep_sorted=True):
+        doc_id = len(self.docs)
+        self.docs.append((source, pos, length))
+        self.total_len += length
+        self._norms = None
+        for t, tf in counts.items():
+            plist = self.postings.get(t)
+            if plist is None:
+                plist = self.postings[t] = {}
+                if keep_sorted:
+                    insort(self.vocab, t)
+            plist[doc_id] = tf
+
+    def sync(self, state, archived=None, cold=None, seq=None):
+        """
+        Indexes entries appended to state[source] since the last sync; returns how many.
+        archived: {source: (first, hot start)} when state[source] holds only the entries from hot start on;
+        cold(source, start, stop) then returns the archived entries the index has not seen yet.
+        seq: the journal seq `state` was persisted at. The index is shared by all sessions of the user,
+        so a session holding an older state than the index has seen is not synced from; otherwise it
+        would look like a rewritten list and force a rebuild.
+        """
+        archived = archived or {}
+        added = 0
+        with self._lock:
+            if seq is not None:
+                if seq < self.seq:
+                    return 0
+                self.seq = seq
+            for source in SOURCES:
+                items = state.get(source) or []
+                hot = archived.get(source, (0, 0))[1]
+                count, tail = self.synced[source]
+                if count > hot + len(items) or (count > hot and _entry_digest(items[count - 1 - hot]) != tail):
+                    # cleared or replaced (a reload from elsewhere): start over
+                    self._reset()
+                    lines = [json.dumps({"version": INDEX_VERSION})]
+                    break
+            else:
+                lines = []
+            for source in SOURCES:
+                items = state.get(source) or []
+                first, hot = archived.get(source, (0, 0))
+                start = self.synced[source][0]
+                if start < first or (start < hot and cold is None):
+                    # cleared (or archived, with no way to read them back) before they were indexed
+                    start = max(first, hot) if cold is None else first
+                    self.synced[source] = [start, None]
+                    lines.append(json.dumps({"s": source, "skip": start, "q": self.seq}))
+                entries = cold(source, start, hot) if start < hot else []
+                entries += items[max(start - hot, 0):]
+                for pos, entry in enumerate(entries, start):
+                    counts, length = {}, 0
+                    for t in tokenize(entry_text(source, entry)):
+                        counts[t] = counts.get(t, 0) + 1
+                        length += 1
+                    digest = _entry_digest(entry)
+                    self._add(source, pos, length, counts)
+                    self.synced[source] = [pos + 1, digest]
+                    lines.append(json.dumps({"s": source, "p": pos, "n": length, "d": digest, "tf": counts, "q": self.seq},
+                                            separators=(",", ":"), ensure_ascii=False))
+                    added += 1
+            if lines:
+                self._write(lines)
+        return added
+
+    # ---- querying ----
+    def _expand(self, term):
+        i = bisect_left(self.vocab, term)
+        out = []
+        while i < len(self.vocab) and self.vocab[i].startswith(term) and len(out) < MAX_PREFIX_TERMS:
+            out.append(self.vocab[i])
+            i += 1
+        return out
+
+    def search(self, query, sources=None, limit=20, prefix_last=True, first=None):
+        """
+        Returns [(score, source, position)] best first. "term*" is a prefix query.
+        first: {source: position}; older entries (cleared since they were indexed) are left out.
+        """
+        raw = query.lower().split()
+        with self._lock:
+            n = len(self.docs)
+            if not n or not raw:
+                return []
+            if self._norms is None:
+                avg = self.total_len / n or 1.0
+                self._norms = [K1 * (1 - B + B * d[2] / avg) for d in self.docs]
+            norms = self._norms
+            scores = {}
+            for i, word in enumerate(raw):
+                is_prefix = word.endswith("*") or (prefix_last and i == len(raw) - 1)
+                for term in tokenize(word):
+                    terms = self._expand(term) if is_prefix else ([term] if term in self.postings else [])
+                    for t in terms:
+                        plist = self.postings[t]
+                        w = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5)) * (K1 + 1)
+                        for doc_id, tf in plist.items():
+                            scores[doc_id] = scores.get(doc_id, 0.0) + w * tf / (tf + norms[doc_id])
+            if sources is not None:
+                scores = {d: s for d, s in scores.items() if self.docs[d][0] in sources}
+            if first:
+                scores = {d: s for d, s in scores.items() if self.docs[d][1] >= first.get(self.docs[d][0], 0)}
+            best = heapq.nlargest(limit, scores.items(), key=lambda kv: kv[1])
+            return [(s, self.docs[d][0], self.docs[d][1]) for d, s in best]
+
+    def stats(self):
+        with self._lock:
+            return {"docs": len(self.docs), "terms": len(self.vocab), "seq": self.seq,
+                    **{s: c for s, (c, _) in self.synced.items()}}
+
+    # ---- persistence ----
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return
+        if not lines or lines[0] != json.dumps({"version": INDEX_VERSION}):
+            return
+        for line in lines[1:]:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # torn last line from a crashed writer
+            source = rec["s"]
+            self.seq = max(self.seq, rec.get("q", 0))
+            if source in self.synced and "skip" in rec:
+                if rec["skip"] > self.synced[source][0]:
+                    self.synced[source] = [rec["skip"], None]
+            elif source in self.synced and rec["p"] == self.synced[source][0]:
+                self._add(source, rec["p"], rec["n"], rec["tf"], keep_sorted=False)
+                self.synced[source] = [rec["p"] + 1, rec["d"]]
+        self.vocab = sorted(self.postings)
+
+    def _write(self, lines):
+        if not self.path:
+            return
+        data = "\n".join(lines) + "\n"
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if lines[0].startswith('{"version"'):
+            # a rebuild replaces the log; everyone else keeps appending to the new file
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+            return
+        new = not os.path.exists(self.path)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write((json.dumps({"version": INDEX_VERSION}) + "\n" if new else "") + data)
+
+
+_indexes = UserRegistry(SearchIndex)
+
+
+def get_index(user, path=INDEX_FILE):
+    return _indexes.get(path, user)
@@ -0,0 +1,140 @@
+"""
+Startup import profile for dashb.py.
+
+Each page is rendered once, headless (streamlit AppTest), in a fresh
+interpreter started with `python -X importtime`. Only imports triggered by
+the script itself are counted: streamlit and the test harness are imported
+before a marker line, everything after it is the app's own cost. Every page
+runs `--repeat` times and the median is reported.
+
+Modules in LAZY must only show up on the pages listed for them (no provider
+key and TTS off, so requests and gtts must not load at all); a page that
+pulls one in anyway fails the report.
+
+    python startup_report.py                            table for every page
+    python startup_report.py --json out.json            also write the numbers
+    python startup_report.py --baseline base.json       exit 1 on a regression vs a saved --json
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashb.py")
+PAGES = ["🏠 Dashboard", "🤖 AI Mentor", "📝 Notes", "🧪 Quizzes", "🧪 Code Runner", "🌌 Spectorial"]
+# module -> pages allowed to import it on first render
+LAZY = {"plotly": {"🏠 Dashboard"}, "requests": set(), "gtts": set()}
+MARKER = "lpd-startup-report: app starts here"
+TOLERANCE = 0.25
+SLACK_MS = 20.0
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def _child(page):
+    # runs inside `python -X importtime`; state files go to a throwaway directory
+    from streamlit.testing.v1 import AppTest
+    import time
+    os.chdir(tempfile.mkdtemp(prefix="lpd-startup-"))
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.session_state["nav_page"] = page
+    sys.stderr.write(MARKER + "\n")
+    sys.stderr.flush()
+    t0 = time.perf_counter()
+    at.run()
+    print(json.dumps({"render_ms": (time.perf_counter() - t0) * 1000, "errors": [e.value for e in at.exception]}))
+
+
+def parse_importtime(stderr):
+    """Top-level imports after the marker -> {package: cumulative ms}."""
+    lines = stderr.splitlines()
+    if MARKER in lines:
+        lines = lines[lines.index(MARKER) + 1:]
+    packages = {}
+    for line in lines:
+        m = _LINE_RE.match(line)
+        if not m or len(m.group(3)) != 1:  # one space = imported directly by the script
+            continue
+        pkg = m.group(4).split(".")[0]
+        packages[pkg] = packages.get(pkg, 0.0) + int(m.group(2)) / 1000.0
+    return packages
+
+
+def profile_page(page, repeat=3):
+    env = dict(os.environ)
+    for k in ("OPENAI_API_KEY", "DEEPSEEK_API_KEY"):
+        env.pop(k, None)
+    runs = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child", page],
+                              capture_output=True, text=True, encoding="utf-8", env=env, timeout=300)
+        out = proc.stdout.strip().splitlines()
+        if proc.returncode != 0 or not out:
+            raise RuntimeError(f"{page}: child failed\n{proc.stderr[-2000:]}")
+        result = json.loads(out[-1])
+        result["packages"] = parse_importtime(proc.stderr)
+        result["import_ms"] = sum(result["packages"].values())
+        runs.append(result)
+    runs.sort(key=lambda r: r["import_ms"])
+    median = runs[len(runs) // 2]
+    median["render_ms"] = statistics.median(r["render_ms"] for r in runs)
+    return median
+
+
+def check(report, baseline=None, tolerance=TOLERANCE):
+    problems = []
+    for page, res in report.items():
+        if res["errors"]:
+            problems.append(f"{page}: script raised {res['errors'][0]}")
+        for mod, allowed in LAZY.items():
+            if mod in res["packages"] and page not in allowed:
+                problems.append(f"{page}: imports {mod} on first render")
+        base = (baseline or {}).get(page)
+        if base:
+            limit = base["import_ms"] * (1 + tolerance) + SLACK_MS
+            if res["import_ms"] > limit:
+                problems.append(f"{page}: imports took {res['import_ms']:.0f} ms (baseline {base['import_ms']:.0f} ms)")
+            new = sorted(p for p, ms in res["packages"].items() if p not in base["packages"] and ms >= SLACK_MS)
+            if new:
+                problems.append(f"{page}: new heavy imports {', '.join(new)}")
+    return problems
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Import-time startup report for dashb.py")
+    ap.add_argument("--pages", nargs="*", default=PAGES)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--top", type=int, default=5)
+    ap.add_argument("--json", dest="json_out")
+    ap.add_argument("--baseline")
+    ap.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = ap.parse_args(argv)
+
+    report = {page: profile_page(page, args.repeat) for page in args.pages}
+    for page, res in report.items():
+        top = sorted(res["packages"].items(), key=lambda kv: -kv[1])[:args.top]
+        print(f"{page:<16} imports {res['import_ms']:7.1f} ms   first render {res['render_ms']:7.1f} ms")
+        for pkg, ms in top:
+            print(f"    {pkg:<24}{ms:7.1f} ms")
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    problems = check(report, baseline, args.tolerance)
+    for p in problems:
+        print("FAIL", p)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        _child(sys.argv[2])
+    else:
+        sys.exit(main())
@@ -0,0 +1,672 @@
+"""
+Journaled, per-user persistence for the dashboard state.
+
+A save appends only what changed since the previous save (new chat messages,
+changed course rows, ...) as one numbered batch of ops; compaction folds old
+batches back into a snapshot on a background thread. Every batch carries a
+sequence number, so a session can tell whether the state it holds is still
+current without re-reading anything.
+
+Two interchangeable backends, picked with LPD_STORE (see get_store):
+
+  "sqlite" (default)  one database, WAL mode, one snapshot row and one row per
+                      journal batch for each user. Readers never block; writers
+                      hold the write lock only for a single-row insert.
+
+  "file"              JSON snapshot + JSONL journal segments, guarded by
+                      fcntl.flock so several server processes can share them:
+
+    cse_dashboard_state.json                  snapshot ({..., "_journal_gen": g, "_journal_seq": n})
+    cse_dashboard_state.journal.000004.jsonl  segments newer than g, replayed on load
+
+The append-only lists may be trimmed at the front: older entries move to a
+per-user cold archive (see archive.py), a "trim" op records the absolute
+position the list now starts at, and ARCHIVED_KEY maps each list to its
+[first, hot start) range in the archive.
+
+Keys with a registered codec (register_codec, e.g. the chat log as Arrow IPC)
+are stored in binary in SQLite snapshots; the journal is always JSON.
+"""
+
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import struct
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows: fall back to in-process locking only
+    fcntl = None
+
+# list-valued keys that normally only grow: saved as "extend" ops
+APPEND_KEYS = ("chat_history", "notes", "spectorial_entries")
+# list-of-records keys diffed row by row: saved as "rows" ops
+ROW_KEYS = ("courses",)
+# {append key: [first, hot start]}: entries [first, hot start) of that list are in its cold archive
+ARCHIVED_KEY = "archived"
+
+GEN_KEY = "_journal_gen"
+SEQ_KEY = "_journal_seq"
+COMPACT_BYTES = 256 * 1024
+COMPACT_BATCHES = 500
+DEFAULT_USER = "default"
+MAX_OPEN_STORES = 256
+
+
+def _default(obj):
+    # typed values (see columns.py) know their plain JSON form
+    to_record = getattr(obj, "to_record", None)
+    return to_record() if to_record is not None else str(obj)
+
+
+def _dumps(obj):
+    return json.dumps(obj, separators=(",", ":"), default=_default)
+
+
+def _is_list(value):
+    return isinstance(value, Sequence) and not isinstance(value, (str, bytes))
+
+
+def _digest(value):
+    return hashlib.blake2b(_dumps(value).encode("utf-8"), digest_size=8).hexdigest()
+
+
+# ------------------ Deltas ------------------
+def diff_state(state, shadow):
+    """
+    Compare `state` against the shadow of the last persisted state.
+    Returns (ops, new_shadow). Cost depends on the size of the change,
+    plus one digest per course row.
+    """
+    shadow = shadow or {}
+    ops, new_shadow = [], {}
+    for key, value in state.items():
+        old = shadow.get(key)
+        if key in APPEND_KEYS and _is_list(value):
+            tail = _digest(value[-1]) if value else None
+            new_shadow[key] = (len(value), tail)
+            if isinstance(old, tuple):
+                n, last = old
+                # same prefix as last time -> only the new items are written
+                if len(value) >= n and (n == 0 or _digest(value[n - 1]) == last):
+                    if len(value) > n:
+                        ops.append({"op": "extend", "key": key, "items": value[n:]})
+                    continue
+            ops.append({"op": "set", "key": key, "value": value})
+        elif key in ROW_KEYS and isinstance(value, list):
+            digests = [_digest(r) for r in value]
+            new_shadow[key] = digests
+            if isinstance(old, list) and len(digests) >= len(old):
+                changed = {str(i): value[i] for i, d in enumerate(digests) if i >= len(old) or d != old[i]}
+                if changed:
+                    ops.append({"op": "rows", "key": key, "rows": changed})
+                continue
+            ops.append({"op": "set", "key": key, "value": value})
+        else:
+            d = _digest(value)
+            new_shadow[key] = d
+            if d != old:
+                ops.append({"op": "set", "key": key, "value": value})
+    return ops, new_shadow
+
+
+def archived_range(state, key):
+    first, hot = (state.get(ARCHIVED_KEY) or {}).get(key) or (0, 0)
+    return int(first), int(hot)
+
+
+def trim_shadow(shadow, key, drop):
+    # the shadow of an append key after its first `drop` items went to the archive
+    old = (shadow or {}).get(key)
+    if not isinstance(old, tuple):
+        return shadow
+    n, last = old
+    return {**shadow, key: (n - drop, last) if n > drop else (0, None)}
+
+
+def apply_ops(state, ops):
+    for op in ops:
+        key = op["key"]
+        if op["op"] == "trim":
+            # the list now starts at absolute position op["to"]; idempotent, so replays and
+            # concurrent sessions trimming the same entries drop them once
+            first, hot = archived_range(state, key)
+            drop = op["to"] - hot
+            if drop > 0:
+                items = state.get(key)
+                if _is_list(items):
+                    skip = getattr(items, "skip", None)  # a ChatLog slices its columnar base
+                    state[key] = skip(drop) if skip is not None else list(items[drop:])
+                # a new dict: sessions hold shallow copies of this state
+                state[ARCHIVED_KEY] = {**(state.get(ARCHIVED_KEY) or {}), key: [first, op["to"]]}
+        elif op["op"] == "set":
+            state[key] = op["value"]
+        elif op["op"] == "extend":
+            if not _is_list(state.get(key)):
+                state[key] = []
+            state[key].extend(op["items"])
+        elif op["op"] == "rows":
+            rows = state.get(key)
+            if not isinstance(rows, list):
+                rows = state[key] = []
+            for i, row in sorted(op["rows"].items(), key=lambda kv: int(kv[0])):
+                i = int(i)
+                if i < len(rows):
+                    rows[i] = row
+                else:
+                    rows.append(row)
+    return state
+
+
+def shadow_of(state):
+    return diff_state(state, None)[1]
+
+
+def copy_state(state):
+    # one level deep: enough for sessions to append/replace without touching the shared cache
+    return {k: (v.copy() if hasattr(v, "copy") else v) for k, v in state.items()}
+
+
+# ------------------ Binary snapshots ------------------
+_CODECS = {}
+_SNAPSHOT_MAGIC = b"LPDS\x01"
+
+
+def register_codec(key, encode, decode):
+    """encode(value) -> bytes and decode(bytes-like) -> value for one state key in SQLite snapshots."""
+    _CODECS[key] = (encode, decode)
+
+
+def _encode_snapshot(state):
+    keys = [k for k in _CODECS if state.get(k) is not None]
+    if not keys:
+        return _dumps(state)
+    blobs = [_CODECS[k][0](state[k]) for k in keys]
+    header = _dumps({"state": {k: v for k, v in state.items() if k not in keys},
+                     "blobs": [[k, len(b)] for k, b in zip(keys, blobs)]}).encode("utf-8")
+    return b"".join([_SNAPSHOT_MAGIC, struct.pack("<Q", len(header)), header] + blobs)
+
+
+def _decode_snapshot(raw):
+    if not isinstance(raw, bytes) or not raw.startswith(_SNAPSHOT_MAGIC):
+        return json.loads(raw)
+    pos = len(_SNAPSHOT_MAGIC) + 8
+    (size,) = struct.unpack_from("<Q", raw, len(_SNAPSHOT_MAGIC))
+    header = json.loads(raw[pos:pos + size])
+    pos += size
+    state = header["state"]
+    view = memoryview(raw)
+    for key, length in header["blobs"]:
+        state[key] = _CODECS[key][1](view[pos:pos + length])
+        pos += length
+    return state
+
+
+def _hand_out(state, seq, since):
+    if state is None or seq == since:
+        return None, seq
+    return copy_state(state), seq
+
+
+@contextmanager
+def file_lock(path, blocking=True):
+    if fcntl is None:
+        yield True
+        return
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# ------------------ File backend ------------------
+class JournalStore:
+    def __init__(self, path, compact_bytes=COMPACT_BYTES, compact_batches=COMPACT_BATCHES):
+        self.path = os.path.abspath(path)
+        self.dir = os.path.dirname(self.path)
+        self.stem = os.path.splitext(os.path.basename(self.path))[0] + ".journal."
+        self.lock_path = self.path + ".lock"
+        self.compact_bytes = compact_bytes
+        self.compact_batches = compact_batches
+        self._lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._cache = None
+        self._seq = None
+        self._tail = None  # (segment gen, size) right after our last append
+        self._batches = 0
+        self._compacting = False
+        os.makedirs(self.dir, exist_ok=True)
+
+    def _segment_path(self, gen):
+        return os.path.join(self.dir, f"{self.stem}{gen:06d}.jsonl")
+
+    def _segments(self):
+        segs = []
+        try:
+            names = os.listdir(self.dir)
+        except FileNotFoundError:
+            return segs
+        for name in names:
+            if name.startswith(self.stem) and name.endswith(".jsonl"):
+                try:
+                    segs.append((int(name[len(self.stem):-6]), os.path.join(self.dir, name)))
+                except ValueError:
+                    continue
+        segs.sort()
+        return segs
+
+    def _read_snapshot(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None, 0, 0
+        return state, state.pop(GEN_KEY, 0), state.pop(SEQ_KEY, 0)
+
+    @staticmethod
+    def _replay(path, state, seq, offset=0):
+        # applies the complete lines after `offset`; returns (last seq, new offset)
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                batch = json.loads(line)
+            except ValueError:
+                continue  # torn write
+            seq = batch.get("seq", seq + 1)
+            apply_ops(state, batch["ops"])
+        return seq, offset + end
+
+    @staticmethod
+    def _last_seq_in(path):
+        # seq of the last complete line, reading backwards from the end of the file
+        with open(path, "rb") as f:
+            pos = f.seek(0, 2)
+            buf = b""
+            while pos > 0:
+                step = min(8192, pos)
+                pos -= step
+                f.seek(pos)
+                buf = f.read(step) + buf
+                last = buf.rfind(b"\n")
+                if last == -1:
+                    continue
+                prev = buf.rfind(b"\n", 0, last)
+                if prev != -1 or pos == 0:
+                    try:
+                        return json.loads(buf[prev + 1:last]).get("seq")
+                    except ValueError:
+                        return None
+        return None
+
+    def _fold(self, upto=None):
+        # segments are listed before the snapshot is read; if compaction removes one
+        # in between, the replacement snapshot already contains it, so just retry
+        for _ in range(5):
+            segs = self._segments()
+            state, gen, seq = self._read_snapshot()
+            found = state is not None
+            state = state or {}
+            offsets = {}
+            try:
+                for g, p in segs:
+                    if g > gen and (upto is None or g <= upto):
+                        seq, offsets[g] = self._replay(p, state, seq)
+                        found = True
+            except FileNotFoundError:
+                continue
+            return {"state": state if found else None, "gen": gen, "seq": seq, "offsets": offsets}
+        raise RuntimeError("state journal kept changing during load")
+
+    def version(self):
+        # physical version: snapshot stat plus segment sizes, a handful of stat calls
+        try:
+            s = os.stat(self.path)
+            snap = (s.st_mtime_ns, s.st_size)
+        except FileNotFoundError:
+            snap = None
+        segs = []
+        for g, p in self._segments():
+            try:
+                segs.append((g, os.path.getsize(p)))
+            except FileNotFoundError:
+                pass
+        return snap, tuple(segs)
+
+    def load(self):
+        return self._fold()["state"]
+
+    def load_cached(self, since=None):
+        """
+        Returns (state, seq) from a parse cache shared by every session in the
+        process. Unchanged files cost a few stat calls; journal growth replays
+        only the new bytes. `state` is a private copy, or None when nothing is
+        persisted or the caller already holds `since == seq`.
+        """
+        with self._cache_lock:
+            version = self.version()
+            c = self._cache
+            if c is not None and c["version"] == version:
+                return _hand_out(c["state"], c["seq"], since)
+            fold = None
+            if c is not None and c["snap"] == version[0]:
+                sizes = dict(version[1])
+                if all(sizes.get(g, -1) >= off for g, off in c["offsets"].items()):
+                    state = c["state"] if c["state"] is not None else {}
+                    seq, offsets = c["seq"], dict(c["offsets"])
+                    try:
+                        for g, size in version[1]:
+                            if g > c["gen"] and size > offsets.get(g, 0):
+                                seq, offsets[g] = self._replay(self._segment_path(g), state, seq, offsets.get(g, 0))
+                        fold = {"state": state if (state or seq) else None, "gen": c["gen"], "seq": seq, "offsets": offsets}
+                    except FileNotFoundError:
+                        fold = None
+            if fold is None:
+                fold = self._fold()
+            fold["version"] = version
+            fold["snap"] = version[0]
+            self._cache = fold
+            return _hand_out(fold["state"], fold["seq"], since)
+
+    def _current_seq(self, segs):
+        # under the file lock: another process may have appended since our last write
+        if segs and self._tail == (segs[-1][0], os.path.getsize(segs[-1][1])):
+            return self._seq
+        for _, p in reversed(segs):
+            try:
+                seq = self._last_seq_in(p)
+            except FileNotFoundError:
+                continue  # folded by a compactor meanwhile; the snapshot covers it
+            if seq is not None:
+                return seq
+        return self._read_snapshot()[2]
+
+    def append(self, ops):
+        """Appends one batch of ops; returns its sequence number (None if there was nothing to write)."""
+        if not ops:
+            return None
+        with self._lock, file_lock(self.lock_path):
+            segs = self._segments()
+            gen = segs[-1][0] if segs else self._read_snapshot()[1] + 1
+            seq = self._current_seq(segs) + 1
+            with open(self._segment_path(gen), "a", encoding="utf-8") as f:
+                f.write(_dumps({"seq": seq, "ops": ops}) + "\n")
+                size = f.tell()
+            self._seq, self._tail = seq, (gen, size)
+            self._batches += 1
+            due = size >= self.compact_bytes or self._batches >= self.compact_batches
+        if due:
+            self.compact()
+        return seq
+
+    def compact(self, background=True):
+        with self._lock:
+            if self._compacting:
+                return False
+            self._compacting = True
+            self._batches = 0
+        if background:
+            threading.Thread(target=self._compact, daemon=True, name="lpd-compact").start()
+        else:
+            self._compact()
+        return True
+
+    def _compact(self):
+        try:
+            # one compactor across all processes; the others just skip
+            with file_lock(self.path + ".compact.lock", blocking=False) as got:
+                if not got:
+                    return
+                with self._lock, file_lock(self.lock_path):
+                    segs = self._segments()
+                    if not segs:
+                        return
+                    sealed = segs[-1][0]
+                    # new appends go to the next segment while the sealed ones are folded
+                    open(self._segment_path(sealed + 1), "a", encoding="utf-8").close()
+                fold = self._fold(upto=sealed)
+                state = fold["state"] or {}
+                state[GEN_KEY] = sealed
+                state[SEQ_KEY] = fold["seq"]
+                tmp = f"{self.path}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(_dumps(state))
+                os.replace(tmp, self.path)
+                for g, p in self._segments():
+                    if g <= sealed:
+                        try:
+                            os.remove(p)
+                        except FileNotFoundError:
+                            pass
+        finally:
+            with self._lock:
+                self._compacting = False
+
+
+# ------------------ SQLite backend ------------------
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (user TEXT PRIMARY KEY, seq INTEGER NOT NULL, state TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS journal (
+    user TEXT NOT NULL, seq INTEGER NOT NULL, ops TEXT NOT NULL,
+    PRIMARY KEY (user, seq)
+) WITHOUT ROWID;
+"""
+_conns = threading.local()
+
+
+def _connect(db_path):
+    # sqlite3 connections are per thread; Streamlit runs each session's reruns on worker threads
+    conns = getattr(_conns, "by_path", None)
+    if conns is None:
+        conns = _conns.by_path = {}
+    conn = conns.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        conns[db_path] = conn
+    return conn
+
+
+@contextmanager
+def _txn(conn, mode=""):
+    conn.execute(f"BEGIN {mode}")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _scalar(conn, sql, args):
+    row = conn.execute(sql, args).fetchone()
+    return row[0] if row else None
+
+
+class SQLiteStore:
+    def __init__(self, db_path, user, seed_path=None, compact_batches=COMPACT_BATCHES):
+        self.db_path = os.path.abspath(db_path)
+        self.user = user
+        self.compact_batches = compact_batches
+        self._lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._cache = None  # {"state", "seq", "snap_seq"}
+        self._compacting = False
+        if seed_path:
+            self._seed(seed_path)
+
+    def _seed(self, path):
+        # first run on SQLite: adopt an existing JSON/journal state file for this user
+        conn = _connect(self.db_path)
+        if _scalar(conn, "SELECT 1 FROM snapshots WHERE user=? UNION ALL SELECT 1 FROM journal WHERE user=? LIMIT 1",
+                   (self.user, self.user)):
+            return
+        if not os.path.exists(path):
+            return
+        state = JournalStore(path).load()
+        if state is not None:
+            conn.execute("INSERT OR IGNORE INTO snapshots VALUES (?, 0, ?)", (self.user, _dumps(state)))
+
+    def _heads(self, conn):
+        snap_seq = _scalar(conn, "SELECT seq FROM snapshots WHERE user=?", (self.user,))
+        last = _scalar(conn, "SELECT MAX(seq) FROM journal WHERE user=?", (self.user,))
+        return snap_seq, max(snap_seq or 0, last or 0)
+
+    def _replay(self, conn, state, after):
+        seq = after
+        for seq, ops in conn.execute("SELECT seq, ops FROM journal WHERE user=? AND seq>? ORDER BY seq",
+                                     (self.user, after)):
+            apply_ops(state, json.loads(ops))
+        return seq
+
+    def _fold(self, conn):
+        row = conn.execute("SELECT seq, state FROM snapshots WHERE user=?", (self.user,)).fetchone()
+        snap_seq, state = (row[0], _decode_snapshot(row[1])) if row else (None, {})
+        seq = self._replay(conn, state, snap_seq or 0)
+        found = row is not None or seq > 0
+        return (state if found else None), seq, snap_seq
+
+    def load(self):
+        conn = _connect(self.db_path)
+        with _txn(conn):
+            return self._fold(conn)[0]
+
+    def load_cached(self, since=None):
+        """Same contract as JournalStore.load_cached; the freshness check is two indexed lookups."""
+        with self._cache_lock:
+            conn = _connect(self.db_path)
+            with _txn(conn):  # one consistent WAL read snapshot
+                snap_seq, head = self._heads(conn)
+                c = self._cache
+                if c is None or c["seq"] != head:
+                    if c is not None and c["state"] is not None and c["seq"] >= (snap_seq or 0):
+                        # rows after our seq are still in the journal: replay just those
+                        c["seq"] = self._replay(conn, c["state"], c["seq"])
+                        c["snap_seq"] = snap_seq
+                    else:
+                        state, seq, snap_seq = self._fold(conn)
+                        c = self._cache = {"state": state, "seq": seq, "snap_seq": snap_seq}
+            return _hand_out(c["state"], c["seq"], since)
+
+    def append(self, ops):
+        """Appends one batch of ops; returns its sequence number (None if there was nothing to write)."""
+        if not ops:
+            return None
+        conn = _connect(self.db_path)
+        with _txn(conn, "IMMEDIATE"):
+            seq = self._heads(conn)[1] + 1
+            conn.execute("INSERT INTO journal VALUES (?, ?, ?)", (self.user, seq, _dumps(ops)))
+        c = self._cache
+        if seq - ((c or {}).get("snap_seq") or 0) >= self.compact_batches:
+            self.compact()
+        return seq
+
+    def compact(self, background=True):
+        with self._lock:
+            if self._compacting:
+                return False
+            self._compacting = True
+        if background:
+            threading.Thread(target=self._compact, daemon=True, name="lpd-compact").start()
+        else:
+            self._compact()
+        return True
+
+    def _compact(self):
+        try:
+            conn = _connect(self.db_path)
+            with _txn(conn):
+                state, seq, snap_seq = self._fold(conn)
+            if state is None or seq == (snap_seq or 0):
+                return
+            with _txn(conn, "IMMEDIATE"):
+                # another process may have compacted further in the meantime
+                current = _scalar(conn, "SELECT seq FROM snapshots WHERE user=?", (self.user,))
+                if current is None or current < seq:
+                    conn.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)", (self.user, seq, _encode_snapshot(state)))
+                    conn.execute("DELETE FROM journal WHERE user=? AND seq<=?", (self.user, seq))
+        finally:
+            with self._lock:
+                self._compacting = False
+
+
+# ------------------ Store registry ------------------
+_USER_RE = re.compile(r"[^A-Za-z0-9_.@-]+")
+_STORES = OrderedDict()
+_STORES_LOCK = threading.Lock()
+
+
+def safe_user_id(user):
+    user = _USER_RE.sub("_", str(user or "")).strip("._")[:64]
+    return user or DEFAULT_USER
+
+
+def user_state_path(path, user):
+    # the default user keeps the historical file name; everyone else gets a directory of their own
+    if user == DEFAULT_USER:
+        return os.path.abspath(path)
+    base, name = os.path.split(os.path.abspath(path))
+    return os.path.join(base, os.path.splitext(name)[0] + ".users", user, name)
+
+
+class UserRegistry:
+    """
+    Objects kept per user file (user_state_path) per process and shared by every session of that user:
+    the progress and score logs, the search index, the history archives. factory(full path) builds one.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, user):
+        with self._lock:
+            full = user_state_path(path, user)
+            item = self._items.get(full)
+            if item is None:
+                item = self._items[full] = self.factory(full)
+            return item
+
+
+def get_store(user=DEFAULT_USER, path="cse_dashboard_state.json", db_path="cse_dashboard_state.sqlite", backend=None):
+    """
+    One store per (backend, user) per process, shared by every session of that
+    user; the least recently used ones are dropped past MAX_OPEN_STORES.
+    backend: "sqlite" (default) or "file"; LPD_STORE overrides the default.
+    """
+    user = safe_user_id(user)
+    backend = backend or os.environ.get("LPD_STORE", "sqlite")
+    if backend == "file":
+        key = ("file", user_state_path(path, user))
+    else:
+        key = ("sqlite", os.path.abspath(db_path), user)
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            if backend == "file":
+                store = JournalStore(key[1])
+            else:
+                # the default user inherits whatever the JSON file backend already holds
+                store = SQLiteStore(key[1], user, seed_path=os.path.abspath(path) if user == DEFAULT_USER else None)
+            _STORES[key] = store
+            while len(_STORES) > MAX_OPEN_STORES:
+                _STORES.popitem(last=False)
+        _STORES.move_to_end(key)
+        return store
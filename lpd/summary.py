@@ -0,0 +1,66 @@
+"""
+Running conversation summary for the mentor's short-term memory.
+
+The summary is a small JSON-friendly dict kept in the session state and
+persisted with it: per-topic counts of user messages over the whole history,
+the last few user messages, and how many messages have been folded in so
+far. update_summary only looks at messages appended since the previous call,
+and each message is scanned once by a single compiled regex covering every
+topic keyword.
+"""
+
+import re
+
+TOPIC_KEYWORDS = ("python", "ai", "ml", "web", "data", "project", "bug", "debug", "study", "recursion",
+                  "algorithms", "streamlit", "openai", "deepseek")
+RECENT_USER_MSGS = 3
+MAX_TOPICS = 8
+
+# zero-width lookahead so overlapping keywords ("debug" and "bug") are all found,
+# matching anywhere in the text like the old `k in text` checks
+_TOPIC_RE = re.compile("(?=(" + "|".join(sorted(map(re.escape, TOPIC_KEYWORDS), key=len, reverse=True)) + "))")
+
+
+def topics_in(text):
+    return set(_TOPIC_RE.findall(text.lower())) if text else set()
+
+
+def new_summary():
+    return {"seen": 0, "counts": {}, "recent": []}
+
+
+def update_summary(summary, messages, offset=0):
+    """
+    Folds the messages after summary["seen"] into summary in place and returns it; a shorter history
+    starts over. offset: absolute position of messages[0] when older ones were archived (see archive.py);
+    archived messages that were never folded in are skipped.
+    """
+    total = offset + len(messages)
+    if not summary or summary.get("seen", 0) > total:
+        summary = new_summary()
+    counts, recent = summary["counts"], summary["recent"]
+    for m in messages[max(summary["seen"] - offset, 0):]:
+        if m.get("sender") != "user":
+            continue
+        text = m.get("message", "")
+        for k in topics_in(text):
+            counts[k] = counts.get(k, 0) + 1
+        recent.append(text)
+    del recent[:-RECENT_USER_MSGS]
+    summary["seen"] = total
+    return summary
+
+
+def top_topics(summary, n=MAX_TOPICS):
+    counts = (summary or {}).get("counts") or {}
+    return sorted(counts, key=lambda k: (-counts[k], k))[:n]
+
+
+def render_summary(summary, max_chars=800):
+    if not summary or not summary.get("seen"):
+        return None
+    topics = top_topics(summary)
+    text = "Topics: " + (", ".join(topics) if topics else "general")
+    if summary["recent"]:
+        text += " | Recent: " + " | ".join(summary["recent"])
+    return text[:max_chars]
@@ -0,0 +1,209 @@
+"""
+Course syllabi from lpd/courses/.
+
+Each file is a plain-text outline:
+
+    # Python Programming        optional header; several headers = several courses in one catalog file
+    1. Introduction             a module ("N." or "N)" numbered line)
+       - Variables and types    a lesson: indented, bulleted ("-", "*") or numbered "1.2 ..." line
+    2. Basics
+
+Without a header the course is named after the file
+(python_programming.txt -> "Python Programming").
+
+Files are read line by line and parsed course by course, so a large catalog
+is never loaded whole. The index keeps only module titles, lesson counts and
+the byte offset of each course; lesson titles are re-read from that offset
+when asked for. Parsed files are cached by (mtime, size) and only parsed
+again when they change.
+"""
+
+import os
+import re
+import heapq
+import threading
+
+import numpy as np
+
+COURSES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "courses")
+_HEADER_RE = re.compile(rb"^#+\s*(.+?)\s*$")
+_MODULE_RE = re.compile(rb"^(\d+)[.)]\s+(.+?)\s*$")
+_LESSON_RE = re.compile(rb"^(?:\s+[-*]?\s*|[-*]\s+|\d+\.\d+\.?\s+)(.+?)\s*$")
+_WORD_RE = re.compile(r"[a-z0-9+#]+")
+_STOPWORDS = {"and", "or", "the", "of", "to", "in", "a", "an", "for", "with", "programming"}
+
+
+def course_key(name):
+    # "Python Programming", "python" and "PYTHON programming" all map to "python"
+    return " ".join(w for w in str(name).lower().replace("_", " ").split() if w != "programming") or str(name).lower()
+
+
+def title_from_filename(path):
+    stem = os.path.splitext(os.path.basename(path))[0].replace("_", " ").strip()
+    return " ".join(w if not w[:1].islower() else w[:1].upper() + w[1:] for w in stem.split())
+
+
+def iter_courses(path):
+    """Yields one course dict per header (or one for the whole file) while reading the file line by line."""
+    course = None
+    offset = 0
+    with open(path, "rb") as f:
+        for raw in f:
+            line = raw.rstrip(b"\r\n")
+            start, offset = offset, offset + len(raw)
+            if not line.strip():
+                continue
+            m = _HEADER_RE.match(line)
+            if m:
+                if course is not None:
+                    yield course
+                course = _new_course(m.group(1).decode("utf-8", "replace"), path, start)
+                continue
+            if course is None:
+                course = _new_course(title_from_filename(path), path, 0)
+            m = _MODULE_RE.match(line)
+            if m:
+                course["modules"].append({"title": m.group(2).decode("utf-8", "replace"), "lessons": 0})
+            elif course["modules"] and _LESSON_RE.match(line):
+                course["modules"][-1]["lessons"] += 1
+    if course is not None:
+        yield course
+
+
+def _new_course(title, path, offset):
+    return {"title": title, "key": course_key(title), "path": path, "offset": offset, "modules": []}
+
+
+def read_lessons(course, module_index):
+    """Lesson titles of one module, streamed from the course's offset in its file."""
+    lessons = []
+    current = -1
+    with open(course["path"], "rb") as f:
+        f.seek(course["offset"])
+        for n, raw in enumerate(f):
+            line = raw.rstrip(b"\r\n")
+            if not line.strip():
+                continue
+            if n and _HEADER_RE.match(line):
+                break  # next course in the catalog
+            if _MODULE_RE.match(line):
+                current += 1
+                if current > module_index:
+                    break
+                continue
+            m = _LESSON_RE.match(line)
+            if m and current == module_index:
+                lessons.append(m.group(1).decode("utf-8", "replace"))
+    return lessons
+
+
+def module_completion(course, completion):
+    """Per-module completion (0-100) for an overall course completion, modules done in order, weighted by lessons."""
+    weights = np.array([max(m["lessons"], 1) for m in course["modules"]], dtype=float)
+    if not len(weights):
+        return np.zeros(0)
+    done = weights.sum() * min(max(float(completion), 0.0), 100.0) / 100.0
+    before = np.concatenate(([0.0], np.cumsum(weights)[:-1]))
+    return np.clip((done - before) / weights, 0.0, 1.0) * 100.0
+
+
+class SyllabusIndex:
+    def __init__(self, root=COURSES_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._files = {}   # path -> ((mtime_ns, size), [courses])
+        self.by_key = {}   # course_key -> course
+        self._words = {}   # word in a module title -> [(course_key, module index)]
+
+    def refresh(self):
+        """Re-parses files that changed since the last refresh; returns how many were parsed."""
+        parsed = 0
+        with self._lock:
+            seen = set()
+            try:
+                entries = [e for e in os.scandir(self.root) if e.is_file() and not e.name.startswith(".")]
+            except OSError:
+                entries = []
+            for e in entries:
+                st = e.stat()
+                sig = (st.st_mtime_ns, st.st_size)
+                seen.add(e.path)
+                cached = self._files.get(e.path)
+                if cached is None or cached[0] != sig:
+                    self._files[e.path] = (sig, list(iter_courses(e.path)))
+                    parsed += 1
+            for path in set(self._files) - seen:
+                del self._files[path]
+                parsed += 1
+            if parsed:
+                self._rebuild()
+        return parsed
+
+    def _rebuild(self):
+        by_key, words = {}, {}
+        for path in sorted(self._files):
+            for course in self._files[path][1]:
+                by_key.setdefault(course["key"], course)
+        for key, course in by_key.items():
+            for i, module in enumerate(course["modules"]):
+                for w in set(_WORD_RE.findall(module["title"].lower())) - _STOPWORDS:
+                    words.setdefault(w, []).append((key, i))
+        self.by_key, self._words = by_key, words
+
+    def courses(self):
+        return list(self.by_key.values())
+
+    def get(self, name):
+        return self.by_key.get(course_key(name))
+
+    def _module_scores(self, text, course=None):
+        # (course key, module index) -> title words shared with text. Across all courses, only words that
+        # appear in one course's titles count: "Introduction" or "Projects" say nothing about which course
+        key = course_key(course) if course is not None else None
+        hits = {}
+        for w in set(_WORD_RE.findall(str(text).lower())) - _STOPWORDS:
+            refs = self._words.get(w, ())
+            if key is None and len({k for k, _ in refs}) > 1:
+                continue
+            for ref in refs:
+                if key is None or ref[0] == key:
+                    hits[ref] = hits.get(ref, 0) + 1
+        return hits
+
+    def find_modules(self, text, limit=5, course=None):
+        """(course, module index) pairs whose module titles share the most words with text; course: only its modules."""
+        hits = self._module_scores(text, course)
+        best = heapq.nlargest(limit, hits, key=hits.get)
+        return [(self.by_key[k], i) for k, i in best]
+
+    def best_module(self, text, course=None, min_score=1):
+        """The one module matching text best, or None if nothing scores min_score or the best is tied."""
+        hits = self._module_scores(text, course)
+        top = heapq.nlargest(2, hits.values())
+        if not top or top[0] < min_score or (len(top) > 1 and top[1] == top[0]):
+            return None
+        k, i = max(hits, key=hits.get)
+        return self.by_key[k], i
+
+    def next_module(self, name, completion):
+        """The first module not yet finished at this completion, or None."""
+        course = self.get(name)
+        if not course or not course["modules"]:
+            return None
+        per_module = module_completion(course, completion)
+        open_modules = np.flatnonzero(per_module < 100)
+        return course["modules"][int(open_modules[0])] if len(open_modules) else None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_syllabus(root=COURSES_DIR):
+    # one index per process; refresh() is a stat() per file when nothing changed
+    global _index
+    with _index_lock:
+        if _index is None or _index.root != root:
+            _index = SyllabusIndex(root)
+    _index.refresh()
+    return _index
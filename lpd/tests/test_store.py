@@ -0,0 +1,134 @@
+import threading
+
+import pytest
+
+from store import (ARCHIVED_KEY, JournalStore, SQLiteStore, apply_ops, copy_state, diff_state, shadow_of,
+                   trim_shadow)
+
+
+def make_state(n_messages=5):
+    return {
+        "chat_history": [{"sender": "user", "message": f"m{i}"} for i in range(n_messages)],
+        "notes": ["a", "b"],
+        "courses": [{"course": "Python", "completion": 10}, {"course": "C", "completion": 40}],
+        "assistant_mode": "Tutor",
+    }
+
+
+def round_trip(old, new, shadow=None):
+    ops, new_shadow = diff_state(new, shadow_of(old) if shadow is None else shadow)
+    assert apply_ops(copy_state(old), ops) == new
+    assert new_shadow == shadow_of(new)
+    return ops
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def open_store(request, tmp_path):
+    # a new store instance on the same files each call, as another server process would open it
+    def open_store(**kw):
+        if request.param == "file":
+            return JournalStore(str(tmp_path / "state.json"), **kw)
+        return SQLiteStore(str(tmp_path / "state.sqlite"), "u", **kw)
+    return open_store
+
+
+# ------------------ Deltas ------------------
+def test_extend_round_trip():
+    a = make_state()
+    b = copy_state(a)
+    b["chat_history"] += [{"sender": "bot", "message": "hi"}]
+    b["notes"] += ["c"]
+    ops = round_trip(a, b)
+    assert {op["op"] for op in ops} == {"extend"}
+
+
+def test_rows_round_trip():
+    a = make_state()
+    b = copy_state(a)
+    b["courses"][1] = {"course": "C", "completion": 55}
+    b["courses"].append({"course": "Go", "completion": 0})
+    ops = round_trip(a, b)
+    assert ops == [{"op": "rows", "key": "courses", "rows": {"1": b["courses"][1], "2": b["courses"][2]}}]
+
+
+def test_set_round_trip():
+    a = make_state()
+    b = copy_state(a)
+    b["assistant_mode"] = "Motivator"
+    b["notes"] = ["rewritten"]  # an append key whose prefix changed is written whole
+    b["courses"] = b["courses"][:1]  # and so is a row key that shrank
+    ops = round_trip(a, b)
+    assert {op["key"] for op in ops if op["op"] == "set"} == {"assistant_mode", "notes", "courses"}
+
+
+def test_trim_round_trip():
+    a = make_state(10)
+    b = copy_state(a)
+    b["chat_history"] = a["chat_history"][4:] + [{"sender": "user", "message": "new"}]
+    b[ARCHIVED_KEY] = {"chat_history": [0, 4]}
+    shadow = trim_shadow(shadow_of(a), "chat_history", 4)
+    trim = {"op": "trim", "key": "chat_history", "to": 4}
+    ops, _ = diff_state(b, shadow)
+    assert {"op": "extend", "key": "chat_history", "items": b["chat_history"][-1:]} in ops
+    ops = [trim] + ops
+    assert apply_ops(copy_state(a), ops) == b
+    # replayed twice (or by two sessions trimming the same entries), the trim still drops them once
+    assert apply_ops(apply_ops(copy_state(a), ops), [trim]) == b
+
+
+# ------------------ Stores ------------------
+def test_load_cached_since_matches_full_load(open_store):
+    one, two = open_store(), open_store()
+    state = make_state()
+    shadow = None
+    for store in (one, two):
+        ops, shadow = diff_state(state, shadow)
+        store.append(ops)
+    held, seq = one.load_cached()
+    assert held == state and one.load_cached(since=seq) == (None, seq)
+
+    # the other instance appends; the first catches up from the seq it holds
+    state["chat_history"] += [{"sender": "bot", "message": "hi"}]
+    state["courses"][0] = {"course": "Python", "completion": 30}
+    ops, shadow = diff_state(state, shadow)
+    two.append(ops)
+    ops, shadow = diff_state({**state, "notes": state["notes"] + ["c"]}, shadow)
+    one.append(ops)
+    cached, new_seq = one.load_cached(since=seq)
+    assert new_seq > seq
+    assert cached == open_store().load()
+    assert two.load_cached() == (cached, new_seq)
+
+
+def test_compaction_during_appends_loses_no_ops(open_store):
+    writers = [open_store(compact_batches=7), open_store(compact_batches=11)]
+    compactor = open_store()
+    per_writer = 300
+    done = threading.Event()
+
+    def write(w, store):
+        for i in range(per_writer):
+            store.append([{"op": "extend", "key": "notes", "items": [f"{w}-{i}"]}])
+
+    def compact():
+        while not done.is_set():
+            compactor.compact(background=False)
+
+    threads = [threading.Thread(target=write, args=(w, s)) for w, s in enumerate(writers)]
+    folder = threading.Thread(target=compact)
+    folder.start()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    done.set()
+    folder.join()
+    for t in threading.enumerate():
+        if t.name == "lpd-compact":
+            t.join()
+
+    notes = open_store().load()["notes"]
+    assert sorted(notes) == sorted(f"{w}-{i}" for w in range(len(writers)) for i in range(per_writer))
+    for w in range(len(writers)):
+        mine = [n for n in notes if n.startswith(f"{w}-")]
+        assert mine == [f"{w}-{i}" for i in range(per_writer)]